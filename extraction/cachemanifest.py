@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import shutil
+
+# Manifest of the cached extraction outputs, relative to the working directory like the caches themselves
+cacheManifest = "cacheManifest.json"
+
+# Folders that only hold generated files, orphans in them are evicted by evictOrphans.
+# The weather files of the airports are left out, without the downloaded grids they cannot be generated again
+cacheFolders = ["filteredData", "NNData", "graphData"]
+
+
+def fileHash(filename: str) -> str:
+    """sha256 hash of the content of a file
+
+    Args:
+        filename (str): location of the file
+
+    Returns:
+        str: hex digest
+    """
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+
+def _readManifest(manifestFile: str) -> dict:
+    if not os.path.exists(manifestFile):
+        return {"artifacts": {}, "files": {}}
+    with open(manifestFile) as f:
+        return json.load(f)
+
+
+def _writeManifest(manifest: dict, manifestFile: str):
+    with open(f"{manifestFile}.tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(f"{manifestFile}.tmp", manifestFile)
+
+
+def _normalise(params: dict) -> dict:
+    # Dates, tuples and lists are compared the way they are stored in the manifest
+    return json.loads(json.dumps(params, default=str))
+
+
+def _fingerprint(manifest: dict, filename: str) -> str:
+    """Hash of a file, only computed again when its size or modification time changed"""
+    if not os.path.exists(filename):
+        return None
+
+    stat = os.stat(filename)
+    entry = manifest["files"].get(filename)
+    if (
+        entry is None
+        or entry["size"] != stat.st_size
+        or entry["mtime"] != stat.st_mtime
+    ):
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": fileHash(filename),
+        }
+        manifest["files"][filename] = entry
+
+    return entry["sha256"]
+
+
+def _isFresh(
+    manifest: dict, artifact: str, params: dict, upstream: list, ignore: list
+) -> bool:
+    entry = manifest["artifacts"].get(artifact)
+    if entry is None or entry["params"] != _normalise(params):
+        return False
+    # The artifact itself was changed or removed outside of the recorded generation
+    if _fingerprint(manifest, artifact) != entry["sha256"]:
+        return False
+    if sorted(entry["upstream"]) != sorted(upstream):
+        return False
+
+    for filename in upstream:
+        if filename in ignore:
+            continue
+        if _fingerprint(manifest, filename) != entry["upstream"][filename]:
+            return False
+        # Upstream files that are cached outputs themselves have to be fresh too
+        upstreamEntry = manifest["artifacts"].get(filename)
+        if upstreamEntry is not None and not _isFresh(
+            manifest,
+            filename,
+            upstreamEntry["params"],
+            list(upstreamEntry["upstream"]),
+            ignore,
+        ):
+            return False
+
+    return True
+
+
+def isFresh(
+    artifact: str,
+    params: dict,
+    upstream: list = [],
+    ignore: list = [],
+    manifestFile: str = cacheManifest,
+) -> bool:
+    """Checks if a cached file was generated with the same parameters from the current upstream files.\
+        Upstream files that are cached files themselves are checked recursively.
+
+    Args:
+        artifact (str): location of the cached file
+        params (dict): parameters the file is generated with
+        upstream (list, optional): locations of the files it is generated from. Defaults to [].
+        ignore (list, optional): upstream files whose content is not compared. Defaults to [].
+        manifestFile (str, optional): location of the manifest. Defaults to cacheManifest.
+
+    Returns:
+        bool: False if the file has to be generated again
+    """
+    manifest = _readManifest(manifestFile)
+    files = dict(manifest["files"])
+    fresh = _isFresh(
+        manifest,
+        os.path.normpath(artifact),
+        params,
+        [os.path.normpath(filename) for filename in upstream],
+        [os.path.normpath(filename) for filename in ignore],
+    )
+    # Hashes computed during the check are kept for the next one
+    if manifest["files"] != files:
+        _writeManifest(manifest, manifestFile)
+
+    return fresh
+
+
+def artifactEntry(artifact: str, manifestFile: str = cacheManifest) -> dict:
+    """Manifest entry of a cached file
+
+    Args:
+        artifact (str): location of the cached file
+        manifestFile (str, optional): location of the manifest. Defaults to cacheManifest.
+
+    Returns:
+        dict: {"params", "upstream", "sha256", "outputs"}, None if the file was never recorded
+    """
+    return _readManifest(manifestFile)["artifacts"].get(os.path.normpath(artifact))
+
+
+def recordArtifact(
+    artifact: str,
+    params: dict,
+    upstream: list = [],
+    outputs: list = [],
+    manifestFile: str = cacheManifest,
+):
+    """Records a cached file that was just generated, with its parameters and the hashes of its upstream files
+
+    Args:
+        artifact (str): location of the cached file
+        params (dict): parameters the file was generated with
+        upstream (list, optional): locations of the files it was generated from. Defaults to [].
+        outputs (list, optional): other files or folders that belong to the cached file. Defaults to [].
+        manifestFile (str, optional): location of the manifest. Defaults to cacheManifest.
+    """
+    manifest = _readManifest(manifestFile)
+    artifact = os.path.normpath(artifact)
+    manifest["artifacts"][artifact] = {
+        "params": _normalise(params),
+        "upstream": {
+            os.path.normpath(filename): _fingerprint(
+                manifest, os.path.normpath(filename)
+            )
+            for filename in upstream
+        },
+        "sha256": _fingerprint(manifest, artifact),
+        "outputs": [os.path.normpath(filename) for filename in outputs],
+    }
+    _writeManifest(manifest, manifestFile)
+
+
+def renewArtifact(artifact: str, manifestFile: str = cacheManifest):
+    """Records the new hash of a cached file that was rewritten without changing the data it holds,\
+        the files recorded as generated from its previous version stay fresh.
+
+    Args:
+        artifact (str): location of the cached file
+        manifestFile (str, optional): location of the manifest. Defaults to cacheManifest.
+    """
+    manifest = _readManifest(manifestFile)
+    artifact = os.path.normpath(artifact)
+    previous = manifest["artifacts"][artifact]["sha256"]
+    current = _fingerprint(manifest, artifact)
+
+    manifest["artifacts"][artifact]["sha256"] = current
+    for entry in manifest["artifacts"].values():
+        if entry["upstream"].get(artifact) == previous:
+            entry["upstream"][artifact] = current
+    _writeManifest(manifest, manifestFile)
+
+
+def evictOrphans(
+    folders: list = cacheFolders,
+    dryRun: bool = False,
+    manifestFile: str = cacheManifest,
+) -> list:
+    """Removes the files in the cache folders that are not recorded in the manifest and not used by a recorded file,\
+        and forgets recorded files that no longer exist.
+
+    Args:
+        folders (list, optional): folders to clean up. Defaults to cacheFolders.
+        dryRun (bool, optional): only list the orphans. Defaults to False.
+        manifestFile (str, optional): location of the manifest. Defaults to cacheManifest.
+
+    Returns:
+        list: locations of the evicted files and folders
+    """
+    manifest = _readManifest(manifestFile)
+    manifest["artifacts"] = {
+        artifact: entry
+        for artifact, entry in manifest["artifacts"].items()
+        if os.path.exists(artifact)
+    }
+    manifest["files"] = {
+        filename: entry
+        for filename, entry in manifest["files"].items()
+        if os.path.exists(filename)
+    }
+
+    referenced = set()
+    for artifact, entry in manifest["artifacts"].items():
+        referenced.update([artifact, *entry["upstream"], *entry["outputs"]])
+
+    def isReferenced(path):
+        # A file is used when it, or a folder it is in, is referenced
+        while path not in ("", "."):
+            if path in referenced:
+                return True
+            path = os.path.dirname(path)
+        return False
+
+    evicted = []
+    for folder in folders:
+        for root, dirs, files in os.walk(os.path.normpath(folder)):
+            # Folders without anything referenced in them are evicted as a whole
+            for name in list(dirs):
+                path = os.path.join(root, name)
+                if not isReferenced(path) and not any(
+                    reference.startswith(path + os.sep) for reference in referenced
+                ):
+                    evicted.append(path)
+                    dirs.remove(name)
+            evicted.extend(
+                os.path.join(root, name)
+                for name in files
+                if not isReferenced(os.path.join(root, name))
+            )
+
+    if not dryRun:
+        for path in evicted:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        _writeManifest(manifest, manifestFile)
+
+    return evicted
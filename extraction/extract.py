@@ -1,37 +1,282 @@
 import pandas as pd
 import os
+import re
+import sys
+import json
+import hashlib
+import shutil
+import tempfile
 from glob import glob
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from datetime import datetime
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 from extraction.extractionvalues import *
 from extraction.airportvalues import *
-from extraction.weather import fetch_weather_data
+from extraction.weather import fetch_weather_data, weather_file
+from extraction.cachemanifest import (
+    fileHash,
+    isFresh,
+    artifactEntry,
+    recordArtifact,
+    renewArtifact,
+    evictOrphans,
+)
 
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Columns of the linear regression data that are stored as categories in LRDATA.parquet
+lrCategoricalColumns = ["ADEP", "ADES", "ACType", "ACOperator"]
+lrDatetimeColumns = ["FiledOBT", "FiledAT"]
+
+# Manifest of the raw files a flight store was built from, pyarrow skips files starting with "_"
+flightStoreManifest = "_manifest.json"
+
+# Columns of the raw eurocontrol flight files that are read and the names they get
+flightColumns = {
+    "ECTRL ID": "ECTRLID",
+    "ADEP": "ADEP",
+    "ADEP Latitude": "ADEPLat",
+    "ADEP Longitude": "ADEPLong",
+    "ADES": "ADES",
+    "ADES Latitude": "ADESLat",
+    "ADES Longitude": "ADESLong",
+    "FILED OFF BLOCK TIME": "FiledOBT",
+    "FILED ARRIVAL TIME": "FiledAT",
+    "ACTUAL OFF BLOCK TIME": "ActualOBT",
+    "ACTUAL ARRIVAL TIME": "ActualAT",
+    "AC Type": "ACType",
+    "AC Operator": "ACOperator",
+    "ICAO Flight Type": "ICAOFlightType",
+    "STATFOR Market Segment": "FlightType",
+    "Actual Distance Flown (nm)": "ActualDistanceFlown",
+}
+
+# Explicit dtypes so pandas does not have to infer them for every file,
+# the two filter columns only hold a handful of values so they are read as categories
+flightDtypes = {
+    "ECTRL ID": "int64",
+    "ADEP": str,
+    "ADEP Latitude": "float64",
+    "ADEP Longitude": "float64",
+    "ADES": str,
+    "ADES Latitude": "float64",
+    "ADES Longitude": "float64",
+    "FILED OFF BLOCK TIME": str,
+    "FILED ARRIVAL TIME": str,
+    "ACTUAL OFF BLOCK TIME": str,
+    "ACTUAL ARRIVAL TIME": str,
+    "AC Type": str,
+    "AC Operator": str,
+    "ICAO Flight Type": "category",
+    "STATFOR Market Segment": "category",
+}
+
+# Dtypes of the compact frame of extractData, strings are read as categories and coordinates as float32
+compactFlightDtypes = {
+    **flightDtypes,
+    "ADEP": "category",
+    "ADEP Latitude": "float32",
+    "ADEP Longitude": "float32",
+    "ADES": "category",
+    "ADES Latitude": "float32",
+    "ADES Longitude": "float32",
+    "AC Type": "category",
+    "AC Operator": "category",
+}
+
+# Categorical columns of the compact frame, columns in the same group share their categories
+compactCategoryGroups = [["ADEP", "ADES"], ["ACType"], ["ACOperator"], ["FlightType"]]
+
+
+def _readFlightsFile(
+    file: str, marketSegments: list = marketSegments, compact: bool = False
+):
+    """Reads a single monthly eurocontrol file and applies the flight filters to it
 
+    Args:
+        file (str): location of the eurocontrol flights file
+        marketSegments (list, optional): list of market segments to keep. Defaults to marketSegments.
+        compact (bool, optional): read strings as categories and coordinates as float32. Defaults to False.
 
-def extractData(
-    start: datetime = None,
-    end: datetime = None,
-    folderName: str = "data",
-    marketSegments: list = marketSegments,
+    Returns:
+        pd.DataFrame: filtered flights of the file
+    """
+    P = pd.read_csv(
+        file,
+        usecols=list(flightColumns),
+        dtype=compactFlightDtypes if compact else flightDtypes,
+    )
+
+    return _filterFlights(P, marketSegments, compact)
+
+
+def _filterFlights(
+    P: pd.DataFrame, marketSegments: list = marketSegments, compact: bool = False
 ):
-    """extract raw data from eurocontrol data and converts it into a pandas dataframe
+    """Applies the flight filters to raw eurocontrol flights and converts the columns
 
     Args:
-        start (datetime, optional): start time to extract data. Defaults to None.
-        end (datetime, optional): final date to extract data. Defaults to None.
+        P (pd.DataFrame): flights as read from a eurocontrol flights file
+        marketSegments (list, optional): list of market segments to keep. Defaults to marketSegments.
+        compact (bool, optional): the flights were read with compactFlightDtypes. Defaults to False.
+
+    Returns:
+        pd.DataFrame: filtered flights
+    """
+    # Datetime format
+    dform = "%d-%m-%Y %H:%M:%S"
+
+    # Filter before doing any other work on the rows
+    P = P.loc[
+        (P["ICAO Flight Type"] == "S")
+        & P["STATFOR Market Segment"].isin(marketSegments)
+    ]
+
+    P = P.rename(columns=flightColumns).drop(["ICAOFlightType"], axis=1)
+    if compact:
+        # Categoricals can only be compared (ADES != ADEP) when their categories are the same
+        P = _unionCategories([P], compactCategoryGroups)[0]
+    else:
+        P = P.assign(FlightType=lambda x: x.FlightType.astype(object))
+
+    P = (
+        P.assign(FiledOBT=lambda x: pd.to_datetime(x.FiledOBT, format=dform))
+        .assign(FiledAT=lambda x: pd.to_datetime(x.FiledAT, format=dform))
+        .assign(ActualOBT=lambda x: pd.to_datetime(x.ActualOBT, format=dform))
+        .assign(ActualAT=lambda x: pd.to_datetime(x.ActualAT, format=dform))
+        .query("ADES != ADEP")
+    )
+
+    return P
+
+
+def _flightFiles(start: datetime, end: datetime, folderName: str = "data"):
+    """Lists the monthly eurocontrol files of the years between start and end
+
+    Args:
+        start (datetime): start date
+        end (datetime): end date
         folderName (str, optional): foldername to take data from. Defaults to "data".
-        marketSegments ([type], optional): list of market segments to consider default is commercial scheduled. Defaults to marketSegments.
+
+    Returns:
+        list: locations of the monthly files
+    """
+    listOfFiles = []
+    for year in range(start.year, end.year + 1):
+        # Dank file selection https://pynative.com/python-glob/
+        listOfFiles.extend(glob(f"{folderName}/{year}/*/Flights_2*.csv*"))
+
+    return sorted(listOfFiles)
+
+
+def _unionCategories(frames: list, groups: list) -> list:
+    """Gives the categorical columns of several dataframes the same categories, so they stay categorical when concatenated
+
+    Args:
+        frames (list): dataframes with categorical columns
+        groups (list): lists of columns, the columns of a group share their categories as well
+
+    Returns:
+        list: dataframes with the union of the categories of every group
+    """
+    for group in groups:
+        categories = sorted(
+            set().union(
+                *(frame[column].cat.categories for frame in frames for column in group)
+            )
+        )
+        frames = [
+            frame.assign(
+                **{
+                    column: frame[column].cat.set_categories(categories)
+                    for column in group
+                }
+            )
+            for frame in frames
+        ]
+
+    return frames
+
+
+def _readFlightsFiles(
+    listOfFiles: list,
+    marketSegments: list = marketSegments,
+    workers: int = 1,
+    compact: bool = False,
+    sourceFiles: bool = False,
+):
+    """Reads and filters several monthly eurocontrol files into one dataframe
+
+    Args:
+        listOfFiles (list): locations of the eurocontrol flights files
+        marketSegments (list, optional): list of market segments to keep. Defaults to marketSegments.
+        workers (int, optional): number of processes used to read the monthly files.\
+             None uses all cores. Defaults to 1.
+        compact (bool, optional): read strings as categories and coordinates as float32. Defaults to False.
+        sourceFiles (bool, optional): add a categorical sourceFile column with the file every flight was read from.\
+             Defaults to False.
+
+    Returns:
+        pd.DataFrame: filtered flights of all files, in the order of the files
+    """
+    readFile = partial(_readFlightsFile, marketSegments=marketSegments, compact=compact)
+    if workers == 1:
+        frames = [readFile(file) for file in tqdm(listOfFiles)]
+    else:
+        # Every monthly file is parsed and filtered in its own process,
+        # only the already filtered flights are sent back
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            frames = list(
+                tqdm(executor.map(readFile, listOfFiles), total=len(listOfFiles))
+            )
+
+    if compact:
+        # Every file has its own categories
+        frames = _unionCategories(frames, compactCategoryGroups)
+    if sourceFiles:
+        frames = [
+            frame.assign(
+                sourceFile=pd.Categorical.from_codes(
+                    np.full(len(frame), i), categories=listOfFiles
+                )
+            )
+            for i, frame in enumerate(frames)
+        ]
+
+    # concatenate once instead of growing the dataframe file by file
+    return pd.concat(frames, ignore_index=True)
+
+
+def _keepFirstFlights(P: pd.DataFrame):
+    """Sorts flights on ECTRLID and keeps the first row of every ECTRLID. The sort is stable, so a flight\
+        that is in more than one file is kept from the first file, like streamLinearRegressionFormat does
+
+    Args:
+        P (pd.DataFrame): flights in the order of the files they were read from
+
+    Returns:
+        pd.DataFrame: flights with unique ECTRLIDs
+    """
+    return (
+        P.sort_values(by=["ECTRLID"], kind="stable")
+        .drop_duplicates("ECTRLID")
+        .reset_index(drop=True)
+    )
+
+
+def _checkPeriod(start: datetime, end: datetime):
+    """Validates the period of extractData, no dates means all years
 
     Raises:
         ValueError: date needs to be between start of 2015 and end of 2019
 
     Returns:
-        pd.DataFrame: complete pandas flights dataframe
+        tuple: start and end date
     """
-
     # Basic input validation
     if start is None and end is None:
         start = datetime(2015, 1, 1)
@@ -43,55 +288,41 @@ def extractData(
     if end.year < start.year:
         raise ValueError(f"Entered end before start ({start} > {end})")
 
-    years = list(range(start.year, end.year + 1))
-    listOfFiles = []
-    for year in years:
-        # Dank file selection https://pynative.com/python-glob/
-        listOfFiles.extend(glob(f"{folderName}/{year}/*/Flights_2*.csv*"))
+    return start, end
 
-    finalData = pd.DataFrame()
-
-    for file in tqdm(listOfFiles):
-        # read, filter and process csv
-        P = pd.read_csv(file)
-
-        # Datetime format
-        dform = "%d-%m-%Y %H:%M:%S"
-
-        P = (
-            P.query("`ICAO Flight Type` == 'S'")
-            .query("`STATFOR Market Segment` in @marketSegments")
-            .rename(columns={"FILED OFF BLOCK TIME": "FiledOBT"})
-            .rename(columns={"FILED ARRIVAL TIME": "FiledAT"})
-            .rename(columns={"ACTUAL OFF BLOCK TIME": "ActualOBT"})
-            .rename(columns={"ACTUAL ARRIVAL TIME": "ActualAT"})
-            .rename(columns={"STATFOR Market Segment": "FlightType"})
-            .rename(columns={"ADEP Latitude": "ADEPLat"})
-            .rename(columns={"ADEP Longitude": "ADEPLong"})
-            .rename(columns={"ADES Latitude": "ADESLat"})
-            .rename(columns={"ADES Longitude": "ADESLong"})
-            .rename(columns={"AC Type": "ACType"})
-            .rename(columns={"AC Type": "ACType"})
-            .rename(columns={"AC Operator": "ACOperator"})
-            .rename(columns={"ECTRL ID": "ECTRLID"})
-            .rename(columns={"Actual Distance Flown (nm)": "ActualDistanceFlown"})
-            .drop(["AC Registration"], axis=1)
-            .drop(["Requested FL"], axis=1)
-            .drop(["ICAO Flight Type"], axis=1)
-            .assign(FiledOBT=lambda x: pd.to_datetime(x.FiledOBT, format=dform))
-            .assign(FiledAT=lambda x: pd.to_datetime(x.FiledAT, format=dform))
-            .assign(ActualOBT=lambda x: pd.to_datetime(x.ActualOBT, format=dform))
-            .assign(ActualAT=lambda x: pd.to_datetime(x.ActualAT, format=dform))
-            .query("ADES != ADEP")
-        )
-        finalData = finalData.append(P, ignore_index=True)
 
-    # finalData = finalData.
-    finalData = (
-        finalData.sort_values(by=["ECTRLID"])
-        .drop_duplicates("ECTRLID")
-        .reset_index(drop=True)
-    )
+def extractData(
+    start: datetime = None,
+    end: datetime = None,
+    folderName: str = "data",
+    marketSegments: list = marketSegments,
+    workers: int = 1,
+    compact: bool = False,
+):
+    """extract raw data from eurocontrol data and converts it into a pandas dataframe
+
+    Args:
+        start (datetime, optional): start time to extract data. Defaults to None.
+        end (datetime, optional): final date to extract data. Defaults to None.
+        folderName (str, optional): foldername to take data from. Defaults to "data".
+        marketSegments ([type], optional): list of market segments to consider default is commercial scheduled. Defaults to marketSegments.
+        workers (int, optional): number of processes used to read the monthly files.\
+             None uses all cores. Defaults to 1.
+        compact (bool, optional): return airports, aircraft types, operators and flight types as categories\
+             and the coordinates as float32, calculateDelays then gives int16 delays. Defaults to False.
+
+    Raises:
+        ValueError: date needs to be between start of 2015 and end of 2019
+
+    Returns:
+        pd.DataFrame: complete pandas flights dataframe
+    """
+
+    start, end = _checkPeriod(start, end)
+
+    listOfFiles = _flightFiles(start, end, folderName)
+    finalData = _readFlightsFiles(listOfFiles, marketSegments, workers, compact)
+    finalData = _keepFirstFlights(finalData)
 
     return finalData
 
@@ -104,7 +335,7 @@ def calculateDelays(P: pd.DataFrame, delayTypes: list = ["arrival", "departure"]
         delayTypes (list, list): arrival and departure times. Defaults to ["arrival", "departure"].
 
     Returns:
-        pd.DataFrame: Pandas flights dataframe with delays
+        pd.DataFrame: Pandas flights dataframe with delays, int16 for a compact dataframe (see extractData)
     """
     if "arrival" in delayTypes:
         P = P.assign(
@@ -119,9 +350,24 @@ def calculateDelays(P: pd.DataFrame, delayTypes: list = ["arrival", "departure"]
         "ArrivalDelay < 90 & ArrivalDelay > -30 & DepartureDelay < 90 & DepartureDelay > -30 "
     )
 
+    if _isCompact(P):
+        # The delays are whole minutes between -30 and 90
+        P = P.astype(
+            {
+                column: "int16"
+                for column in ["ArrivalDelay", "DepartureDelay"]
+                if column in P
+            }
+        )
+
     return P
 
 
+def _isCompact(P: pd.DataFrame) -> bool:
+    """Checks if a flights dataframe is in the compact format of extractData"""
+    return isinstance(P.dtypes.get("ADEP"), pd.CategoricalDtype)
+
+
 def filterAirports(P: pd.DataFrame, airports: list):
     """Filter pandas airport arrivals and departures to a list of airports
 
@@ -162,203 +408,1012 @@ def linearRegressionFormat(P: pd.DataFrame, airports: list = ICAOTOP50):
         "ADESLong",
     ]
     P = filterAirports(P, airports)
-    P = calculateDelays(P)
+    # Only the columns that are needed are copied by calculateDelays
+    delayColumns = ["FiledOBT", "FiledAT", "ActualOBT", "ActualAT"]
+    P = calculateDelays(
+        P.loc[:, [column for column in P if column in columns + delayColumns]]
+    )
     P = P.loc[:, columns]
     P["month"] = P["FiledAT"].dt.month
     P["weekday"] = P["FiledAT"].dt.weekday
     P["filedATminutes"] = P["FiledAT"].dt.hour * 60 + P["FiledAT"].dt.minute
     P["filedOBTminutes"] = P["FiledOBT"].dt.hour * 60 + P["FiledOBT"].dt.minute
 
+    if _isCompact(P):
+        P = P.astype(
+            {
+                "month": "int8",
+                "weekday": "int8",
+                "filedATminutes": "int16",
+                "filedOBTminutes": "int16",
+            }
+        )
+
     # P = P.drop(["FiledOBT", "FiledAT"], axis=1)
 
     return P
 
 
-def saveToCSV(P: pd.DataFrame, saveFolder: str = "LRData"):
-    """Convert the flights dataframe to a CSV
+def saveToCSV(P: pd.DataFrame, saveFolder: str = "LRData", fileFormat: str = "parquet"):
+    """Save the flights dataframe in linear regression format, readLRDATA reads both formats
 
     Args:
         P (pd.DataFrame): Pandas flights dataframe
-        saveFolder (str): name folder to save the CSV file in. Defaults to "LRData".
+        saveFolder (str): name folder to save the file in. Defaults to "LRData".
+        fileFormat (str, optional): "parquet" saves LRDATA.parquet with categorical airports, aircraft types and\
+            operators and native datetimes, "csv" saves the text file LRDATA.csv. Defaults to "parquet".
     """
 
     if not os.path.exists(saveFolder):
         os.mkdir(os.path.join(saveFolder))
-    P.to_csv(f"{saveFolder}/LRDATA.csv")
 
+    if fileFormat == "csv":
+        P.to_csv(f"{saveFolder}/LRDATA.csv")
+    elif fileFormat == "parquet":
+        P = P.astype(
+            {column: "category" for column in lrCategoricalColumns if column in P}
+        )
+        for column in lrDatetimeColumns:
+            if column in P:
+                P[column] = pd.to_datetime(P[column])
+        P.to_parquet(f"{saveFolder}/LRDATA.parquet")
+    else:
+        raise ValueError("fileFormat should be 'parquet' or 'csv'")
 
-def readLRDATA(saveFolder: str = "LRData", fileName: str = "LRDATA.csv"):
-    """Read data from a flights dataframe in linear regression format
+
+def readLRDATA(
+    saveFolder: str = "LRData",
+    fileName: str = "LRDATA.parquet",
+    preferParquet: bool = False,
+):
+    """Read data from a flights dataframe in linear regression format.
+    The format, parquet or csv, is detected from the content of the requested file.
 
     Args:
         saveFolder (str, optional): folder where data is saved. Defaults to "LRData".
-        fileName (str, optional): filename of the dataset. Defaults to "LRDATA.csv".
+        fileName (str, optional): filename of the dataset. Defaults to "LRDATA.parquet".
+        preferParquet (bool, optional): read the .parquet file with the same name instead when it is newer than\
+            the requested file, for example LRDATA.parquet for LRDATA.csv. Defaults to False.
 
     Returns:
         pd.Dataframe: flights dataframe in linear regression format
     """
     fullfilename = f"{saveFolder}/{fileName}"
+    parquetFilename = os.path.splitext(fullfilename)[0] + ".parquet"
+    if (
+        preferParquet
+        and os.path.exists(parquetFilename)
+        and (
+            not os.path.exists(fullfilename)
+            or os.path.getmtime(parquetFilename) > os.path.getmtime(fullfilename)
+        )
+    ):
+        fullfilename = parquetFilename
+
+    with open(fullfilename, "rb") as f:
+        if f.read(4) == b"PAR1":
+            return pd.read_parquet(fullfilename)
+
     P = pd.read_csv(fullfilename, header=0, index_col=0)
     return P
 
 
-def generalFilterAirport(
+def _spillRun(P: pd.DataFrame, folder: str):
+    """Writes a dataframe sorted on ECTRLID column by column to .npy files that can be memory mapped,\
+        text columns are stored as category codes
+
+    Args:
+        P (pd.DataFrame): flights with an ECTRLID column, sorted on it
+        folder (str): folder to write the run to
+    """
+    os.makedirs(folder)
+    columns = []
+    for i, column in enumerate(P):
+        values = P[column]
+        if pd.api.types.is_string_dtype(values.dtype):
+            values = values.astype("category")
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            np.save(f"{folder}/{i}.npy", values.cat.codes.to_numpy())
+            columns.append(
+                {"name": column, "categories": values.cat.categories.tolist()}
+            )
+        else:
+            np.save(f"{folder}/{i}.npy", values.to_numpy())
+            columns.append({"name": column})
+    _writeJSON(columns, f"{folder}/run.json")
+
+
+def _openRun(folder: str) -> dict:
+    with open(f"{folder}/run.json") as f:
+        columns = json.load(f)
+    run = {"folder": folder, "columns": columns, "cursor": 0}
+    for i, column in enumerate(columns):
+        column["values"] = np.load(f"{folder}/{i}.npy", mmap_mode="r")
+        if column["name"] in ["ECTRLID", "seq"]:
+            run[column["name"]] = column["values"]
+    run["ids"] = run["ECTRLID"]
+
+    return run
+
+
+def _runSlice(run: dict, start: int, end: int) -> pd.DataFrame:
+    """Reads rows start to end of a run, text columns become categoricals with the categories of the run"""
+    data = {}
+    for column in run["columns"]:
+        values = np.array(column["values"][start:end])
+        if "categories" in column:
+            values = pd.Categorical.from_codes(values, column["categories"])
+        data[column["name"]] = values
+
+    return pd.DataFrame(data)
+
+
+def _mergeBounds(runs: list, chunkSize: int):
+    """Splits runs sorted on ECTRLID into consecutive ranges of ECTRLIDs with at most chunkSize rows together,\
+        unless a single ECTRLID has more rows. Moves the cursor of every run to the end of the range.
+
+    Args:
+        runs (list): runs opened with _openRun
+        chunkSize (int): maximum amount of rows in a range
+
+    Yields:
+        list: (start, end) rows of every run in the range
+    """
+
+    def ends(bound):
+        return [int(np.searchsorted(run["ids"], bound, side="right")) for run in runs]
+
+    while any(run["cursor"] < len(run["ids"]) for run in runs):
+        remaining = [run for run in runs if run["cursor"] < len(run["ids"])]
+        if sum(len(run["ids"]) - run["cursor"] for run in remaining) <= chunkSize:
+            bounds = [len(run["ids"]) for run in runs]
+        else:
+            # Largest ECTRLID whose range still fits in a chunk, found by bisection
+            low = min(int(run["ids"][run["cursor"]]) for run in remaining)
+            high = max(int(run["ids"][-1]) for run in remaining)
+            while low < high:
+                middle = (low + high + 1) // 2
+                rows = sum(end - run["cursor"] for run, end in zip(runs, ends(middle)))
+                if rows <= chunkSize:
+                    low = middle
+                else:
+                    high = middle - 1
+            bounds = ends(low)
+
+        yield [(run["cursor"], end) for run, end in zip(runs, bounds)]
+        for run, end in zip(runs, bounds):
+            run["cursor"] = end
+
+
+def streamLinearRegressionFormat(
+    start: datetime = None,
+    end: datetime = None,
+    folderName: str = "data",
+    saveFolder: str = "LRData",
+    fileFormat: str = "parquet",
+    airports: list = ICAOTOP50,
+    marketSegments: list = marketSegments,
+    compact: bool = False,
+    chunkSize: int = 250000,
+):
+    """Writes the same LRDATA file as extractData, linearRegressionFormat and saveToCSV, but reads the eurocontrol\
+        files in chunks and writes the file in parts, so the memory used depends on the chunk size instead of the period.
+        The filtered flights of every chunk are sorted on ECTRLID and spilled to a temporary folder in saveFolder,
+        after which the chunks are merged to remove duplicate flights and to number the flights like extractData.
+
+    Args:
+        start (datetime, optional): start time to extract data. Defaults to None.
+        end (datetime, optional): final date to extract data. Defaults to None.
+        folderName (str, optional): foldername to take data from. Defaults to "data".
+        saveFolder (str, optional): name folder to save the file in. Defaults to "LRData".
+        fileFormat (str, optional): "parquet" or "csv", see saveToCSV. Defaults to "parquet".
+        airports (list, optional): list of airports, see linearRegressionFormat. Defaults to ICAOTOP50.
+        marketSegments (list, optional): list of market segments to consider. Defaults to marketSegments.
+        compact (bool, optional): read the flights in the compact format of extractData. Defaults to False.
+        chunkSize (int, optional): amount of flights read and merged at once. Defaults to 250000.
+
+    Raises:
+        ValueError: no flight files between start and end
+
+    Returns:
+        str: location of the saved file
+    """
+    if fileFormat not in ["parquet", "csv"]:
+        raise ValueError("fileFormat should be 'parquet' or 'csv'")
+    start, end = _checkPeriod(start, end)
+    listOfFiles = _flightFiles(start, end, folderName)
+    if len(listOfFiles) == 0:
+        raise ValueError(f"No flight files in {folderName} between {start} and {end}")
+
+    if not os.path.exists(saveFolder):
+        os.mkdir(os.path.join(saveFolder))
+    filename = f"{saveFolder}/LRDATA.{fileFormat}"
+    spillFolder = tempfile.mkdtemp(prefix="_spill", dir=saveFolder)
+
+    try:
+        # Pass 1: filter every chunk and spill the ECTRLIDs of all flights and the LR rows, both sorted on ECTRLID.
+        # seq numbers the filtered flights in the order extractData concatenates them
+        seq = 0
+        flightRuns, lrRuns = [], []
+        categories = {column: set() for column in lrCategoricalColumns}
+        template = None
+        for file in tqdm(listOfFiles):
+            for chunk in pd.read_csv(
+                file,
+                usecols=list(flightColumns),
+                dtype=compactFlightDtypes if compact else flightDtypes,
+                chunksize=chunkSize,
+            ):
+                P = _filterFlights(chunk, marketSegments, compact)
+                P = P.set_axis(np.arange(seq, seq + len(P)))
+                if compact:
+                    # The compact frame keeps all categories of the files
+                    for column in categories:
+                        categories[column].update(P[column].cat.categories)
+
+                LR = linearRegressionFormat(P, airports)
+                if template is None:
+                    template = LR.iloc[:0]
+
+                for rows, runs in [(P.loc[:, ["ECTRLID"]], flightRuns), (LR, lrRuns)]:
+                    if len(rows) == 0:
+                        continue
+                    rows = rows.assign(
+                        ECTRLID=P["ECTRLID"].to_numpy()[rows.index - seq],
+                        seq=rows.index,
+                    ).sort_values(by=["ECTRLID"], kind="stable")
+                    folder = f"{spillFolder}/{len(flightRuns) + len(lrRuns):06d}"
+                    _spillRun(rows.reset_index(drop=True), folder)
+                    runs.append(folder)
+                seq += len(P)
+
+        flightRuns = [_openRun(folder) for folder in flightRuns]
+        lrRuns = [_openRun(folder) for folder in lrRuns]
+
+        # Pass 2: keep the first flight of every ECTRLID and number the flights like extractData,
+        # which numbers all flights that were read, also the ones linearRegressionFormat filters out
+        offset = 0
+        for run in lrRuns:
+            run["index"] = np.lib.format.open_memmap(
+                f"{run['folder']}/index.npy", "w+", np.int64, (len(run["ids"]),)
+            )
+        for ranges in _mergeBounds(flightRuns, chunkSize):
+            ids = np.concatenate(
+                [run["ids"][a:b] for run, (a, b) in zip(flightRuns, ranges)]
+            )
+            seqs = np.concatenate(
+                [run["seq"][a:b] for run, (a, b) in zip(flightRuns, ranges)]
+            )
+            order = np.lexsort((seqs, ids))
+            ids, seqs = ids[order], seqs[order]
+            first = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+            uniqueIds, firstSeqs = ids[first], seqs[first]
+
+            # Every LR row is one of the flights, so its ECTRLID is in this range too
+            bound = uniqueIds[-1]
+            for run in lrRuns:
+                a = run["cursor"]
+                b = int(np.searchsorted(run["ids"], bound, side="right"))
+                position = np.searchsorted(uniqueIds, run["ids"][a:b])
+                kept = firstSeqs[position] == run["seq"][a:b]
+                run["index"][a:b] = np.where(kept, offset + position, -1)
+                if not compact and fileFormat == "parquet":
+                    # saveToCSV only has categories for the values of the flights that are kept
+                    for column in run["columns"]:
+                        if column["name"] in categories:
+                            codes = np.unique(column["values"][a:b][kept])
+                            categories[column["name"]].update(
+                                np.array(column["categories"], dtype=object)[
+                                    codes[codes >= 0]
+                                ]
+                            )
+                run["cursor"] = b
+            offset += len(uniqueIds)
+
+        # Pass 3: write the kept LR rows in order of ECTRLID
+        if compact or fileFormat == "parquet":
+            dtypes = {
+                column: pd.CategoricalDtype(sorted(values))
+                for column, values in categories.items()
+            }
+        else:
+            dtypes = {column: object for column in categories}
+        template = template.astype(dtypes)
+
+        for run in lrRuns:
+            run["cursor"] = 0
+        parts = (
+            pd.concat(
+                [
+                    template,
+                    *(
+                        _runSlice(run, a, b)
+                        .set_axis(run["index"][a:b])
+                        .loc[lambda x: x.index >= 0]
+                        .drop(columns=["ECTRLID", "seq"])
+                        .astype(dtypes)
+                        for run, (a, b) in zip(lrRuns, ranges)
+                    ),
+                ]
+            ).sort_index()
+            for ranges in _mergeBounds(lrRuns, chunkSize)
+        )
+
+        if fileFormat == "csv":
+            with open(f"{filename}.tmp", "w") as f:
+                template.to_csv(f)
+                for part in parts:
+                    part.to_csv(f, header=False)
+        else:
+            schema = pa.Table.from_pandas(template).schema
+            with pq.ParquetWriter(f"{filename}.tmp", schema) as writer:
+                for part in parts:
+                    writer.write_table(pa.Table.from_pandas(part, schema=schema))
+        os.replace(f"{filename}.tmp", filename)
+    finally:
+        shutil.rmtree(spillFolder, ignore_errors=True)
+
+    return filename
+
+
+def timeslotCalendar(
     start: datetime,
     end: datetime,
-    airport: str,
+    timeslotLength: int,
+    availableMonths: list = None,
+) -> pd.DatetimeIndex:
+    """Dense index of all timeslots between start and end, used to make sure there are no gaps in the timeslots.\
+        Calendars are cached, so repeated calls for the same period are free.
+
+    Args:
+        start (datetime): first timeslot (inclusive)
+        end (datetime): end of the last timeslot (exclusive)
+        timeslotLength (int): length of a timeslot in minutes
+        availableMonths (list, optional): only keep the timeslots in these months,\
+             None keeps all months. Defaults to None.
+
+    Returns:
+        pd.DatetimeIndex: index with the start times of all timeslots
+    """
+    if availableMonths is not None:
+        availableMonths = tuple(availableMonths)
+
+    return _timeslotCalendar(
+        pd.Timestamp(start), pd.Timestamp(end), timeslotLength, availableMonths
+    )
+
+
+@lru_cache(maxsize=32)
+def _timeslotCalendar(start, end, timeslotLength, availableMonths):
+    calendar = pd.date_range(start, end, freq=f"{timeslotLength}min")
+    calendar = calendar[calendar < end]
+
+    if availableMonths is not None:
+        # Only keeps the months for which we have
+        # data specified in the argument availableMonths
+        calendar = calendar[calendar.month.isin(availableMonths)]
+
+    return calendar
+
+
+def buildFlightStore(
+    start: datetime = datetime(2018, 1, 1),
+    end: datetime = datetime(2019, 12, 31),
+    folderName: str = "data",
+    storeFolder: str = "filteredData/flightStore",
+    workers: int = 1,
+):
+    """Extracts all flights once and saves them as a parquet store partitioned by year and month.\
+        Every flight keeps the raw file it was taken from, see updateFlightStore. Any existing store in the folder is replaced.
+
+    Args:
+        start (datetime, optional): start date to extract data. Defaults to datetime(2018, 1, 1).
+        end (datetime, optional): end date to extract data. Defaults to datetime(2019, 12, 31).
+        folderName (str, optional): foldername to take the raw data from. Defaults to "data".
+        storeFolder (str, optional): folder of the flight store. Defaults to "filteredData/flightStore".
+        workers (int, optional): number of processes used to read the monthly files. Defaults to 1.
+    """
+    start, end = _checkPeriod(start, end)
+    listOfFiles = _flightFiles(start, end, folderName)
+    manifest = flightFilesManifest(listOfFiles)
+    P = _keepFirstFlights(
+        _readFlightsFiles(listOfFiles, workers=workers, sourceFiles=True)
+    )
+
+    if os.path.exists(storeFolder):
+        shutil.rmtree(storeFolder)
+
+    for (year, month), partition in _storePartitions(P):
+        _writeStorePartition(partition, year, month, storeFolder)
+
+    _writeJSON(manifest, f"{storeFolder}/{flightStoreManifest}")
+    _recordFlightStore(storeFolder, start, end, folderName)
+
+
+def flightStoreManifestFile(saveFolder: str = "filteredData") -> str:
+    """Location of the manifest of the flight store in saveFolder, the upstream file of the data generated from the store
+
+    Args:
+        saveFolder (str, optional): folder containing the flight store. Defaults to "filteredData".
+
+    Returns:
+        str: location of the manifest
+    """
+    return f"{saveFolder}/flightStore/{flightStoreManifest}"
+
+
+def _flightStoreParams(start, end, folderName: str) -> dict:
+    """Parameters of the flight store in the cache manifest, the raw files of the years from start to end"""
+    return {"start": start, "end": end, "folderName": folderName}
+
+
+def _recordFlightStore(storeFolder: str, start, end, folderName: str):
+    """Records the flight store in the cache manifest, NN data generated from it is outdated when its manifest changes"""
+    recordArtifact(
+        f"{storeFolder}/{flightStoreManifest}",
+        _flightStoreParams(start, end, folderName),
+        outputs=[storeFolder],
+    )
+
+
+def _storePartitions(P: pd.DataFrame):
+    """Groups flights by the year and month of their filed off block time, the partitions of the flight store"""
+    return P.groupby(
+        [P.FiledOBT.dt.year.rename("year"), P.FiledOBT.dt.month.rename("month")]
+    )
+
+
+def _writeStorePartition(
+    partition: pd.DataFrame, year: int, month: int, storeFolder: str
+):
+    """Writes (or replaces) one partition of the flight store"""
+    # Partitions follow the hive naming (year=2019/month=3) so they can be pruned on read
+    partitionFolder = f"{storeFolder}/year={year}/month={month}"
+    os.makedirs(partitionFolder, exist_ok=True)
+
+    # The source files are written as text, the categories would differ between partitions
+    partition = partition.astype({"sourceFile": str})
+
+    # Written next to the partition first, so readers never see half a file
+    partition.to_parquet(f"{partitionFolder}/.part.parquet", index=False)
+    os.replace(f"{partitionFolder}/.part.parquet", f"{partitionFolder}/part.parquet")
+
+
+def _writeJSON(data, filename: str):
+    with open(f"{filename}.tmp", "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(f"{filename}.tmp", filename)
+
+
+def flightFilesManifest(listOfFiles: list, previous: dict = {}) -> dict:
+    """Size, modification time and sha256 hash of the raw flight files.\
+        Files whose size and modification time match the previous manifest are not hashed again.
+
+    Args:
+        listOfFiles (list): locations of the eurocontrol flights files
+        previous (dict, optional): earlier manifest of the files. Defaults to {}.
+
+    Returns:
+        dict: {file: {"size", "mtime", "sha256"}}
+    """
+    manifest = {}
+    for file in listOfFiles:
+        stat = os.stat(file)
+        entry = previous.get(file)
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtime"] != stat.st_mtime
+        ):
+            entry = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": fileHash(file),
+            }
+        manifest[file] = entry
+
+    return manifest
+
+
+def updateFlightStore(
+    start: datetime = datetime(2018, 1, 1),
+    end: datetime = datetime(2019, 12, 31),
+    folderName: str = "data",
+    saveFolder: str = "filteredData",
+    nnFolder: str = "NNData",
+    workers: int = 1,
+):
+    """Brings the flight store and the NN data up to date with the raw eurocontrol files.\
+        Only the monthly files that are new or changed since the store was built are read, their flights\
+        replace the stored flights with the same ECTRLID, and the affected months\
+        of the up to date NN data files in nnFolder are aggregated again. Stores built before the manifest existed are rebuilt.\
+        A flight that is in more than one file is kept from the first file, like in extractData, so a stored flight\
+        of an earlier file that did not change is kept. Flights that disappeared from a changed file are not removed,\
+        so only then the store differs from one built by buildFlightStore().
+
+    Args:
+        start (datetime, optional): start date of the raw files to consider. Defaults to datetime(2018, 1, 1).
+        end (datetime, optional): end date of the raw files to consider. Defaults to datetime(2019, 12, 31).
+        folderName (str, optional): foldername to take the raw data from. Defaults to "data".
+        saveFolder (str, optional): folder containing the flight store. Defaults to "filteredData".
+        nnFolder (str, optional): folder with the NN data saved by generateNNdata. Defaults to "NNData".
+        workers (int, optional): number of processes used to read the monthly files. Defaults to 1.
+
+    Returns:
+        list: (year, month) of the NN data months that were updated
+    """
+    storeFolder = f"{saveFolder}/flightStore"
+    manifestFile = f"{storeFolder}/{flightStoreManifest}"
+
+    previous = {}
+    if os.path.exists(manifestFile):
+        with open(manifestFile) as f:
+            previous = json.load(f)
+    partitionFiles = sorted(glob(f"{storeFolder}/year=*/month=*/part.parquet"))
+    if partitionFiles and "sourceFile" not in pq.read_schema(partitionFiles[0]).names:
+        # Stores built before the source file of the flights was kept are rebuilt
+        previous = {}
+
+    manifest = flightFilesManifest(_flightFiles(start, end, folderName), previous)
+    changedFiles = [
+        file
+        for file, entry in manifest.items()
+        if previous.get(file, {}).get("sha256") != entry["sha256"]
+    ]
+    # The NN data that was generated from the store as it is now can be updated
+    entry = artifactEntry(manifestFile)
+    previousStore = None if entry is None else entry["sha256"]
+
+    if not changedFiles:
+        if manifest != previous:
+            # Only modification times changed, the flights are the same
+            _writeJSON(manifest, manifestFile)
+            if entry is not None:
+                renewArtifact(manifestFile)
+        if not isFresh(manifestFile, _flightStoreParams(start, end, folderName)):
+            _recordFlightStore(storeFolder, start, end, folderName)
+        return []
+
+    print(f"Updating flight store with {len(changedFiles)} new or changed files")
+    if not previous:
+        listOfFiles, partitionFiles = list(manifest), []
+        if os.path.exists(storeFolder):
+            shutil.rmtree(storeFolder)
+    else:
+        listOfFiles = changedFiles
+    P = _keepFirstFlights(
+        _readFlightsFiles(listOfFiles, workers=workers, sourceFiles=True)
+    )
+
+    # The stored partitions with flights of the changed files
+    newPartitions = dict(list(_storePartitions(P)))
+    stored = {}
+    for partitionFile in partitionFiles:
+        key = tuple(int(value) for value in re.findall(r"=(\d+)", partitionFile)[-2:])
+        if key not in newPartitions:
+            ids = pd.read_parquet(partitionFile, columns=["ECTRLID"]).ECTRLID
+            if not ids.isin(P.ECTRLID).any():
+                continue
+        stored[key] = pd.read_parquet(partitionFile)
+
+    if stored:
+        # A stored flight of an earlier file that did not change is kept, like in extractData
+        old = pd.concat(
+            [partition[["ECTRLID", "sourceFile"]] for partition in stored.values()]
+        )
+        oldSource = old.set_index("ECTRLID").sourceFile.astype(str)
+        oldSource = oldSource.loc[oldSource.index.isin(P.ECTRLID)]
+        newSource = (
+            P.set_index("ECTRLID").sourceFile.astype(str).reindex(oldSource.index)
+        )
+        kept = (oldSource < newSource) & ~oldSource.isin(changedFiles)
+        P = P.loc[~P.ECTRLID.isin(oldSource.index[kept])]
+
+    # A flight replaces its old row in whichever partition that was in
+    partitions = dict(list(_storePartitions(P)))
+    touched = [P]
+    for key, partition in stored.items():
+        replaced = partition.ECTRLID.isin(P.ECTRLID)
+        if key not in partitions and not replaced.any():
+            continue
+        touched.append(partition.loc[replaced])
+        partitions[key] = pd.concat([partition.loc[~replaced], partitions.get(key)])
+
+    for (year, month), partition in partitions.items():
+        partition = partition.sort_values(by=["ECTRLID"]).reset_index(drop=True)
+        _writeStorePartition(partition, year, month, storeFolder)
+
+    # Flights can be at an airport in a different month than their partition,
+    # so the NN data months come from the filed times of the old and new rows
+    touched = pd.concat(touched)
+    months = sorted(
+        set(zip(touched.FiledOBT.dt.year, touched.FiledOBT.dt.month))
+        | set(zip(touched.FiledAT.dt.year, touched.FiledAT.dt.month))
+    )
+
+    # Written after the partitions, an interrupted update is picked up again by the next one.
+    # NN data that is not updated below is outdated from here on and regenerated when it is used
+    _writeJSON(manifest, manifestFile)
+    _recordFlightStore(storeFolder, start, end, folderName)
+
+    return updateNNdata(months, previousStore, saveFolder, nnFolder)
+
+
+def updateNNdata(
+    months: list,
+    previousStore: str,
+    saveFolder: str = "filteredData",
+    nnFolder: str = "NNData",
+):
+    """Aggregates the given months again for the NN data files that were up to date with the previous version\
+        of the flight store. Other files are regenerated by generateNNdata when they are used next.
+
+    Args:
+        months (list): (year, month) of the months to aggregate again
+        previousStore (str): hash of the flight store manifest before the update, see artifactEntry
+        saveFolder (str, optional): folder containing the flight store. Defaults to "filteredData".
+        nnFolder (str, optional): folder with the NN data. Defaults to "NNData".
+
+    Returns:
+        list: (year, month) of the months that were aggregated again
+    """
+    storeManifest = os.path.normpath(flightStoreManifestFile(saveFolder))
+
+    # Files are grouped by the parameters they were generated with,
+    # so every month is aggregated once for all airports of a group
+    groups = {}
+    for filename in glob(f"{nnFolder}/*.csv"):
+        entry = artifactEntry(filename)
+        if (
+            entry is None
+            or entry["upstream"].get(storeManifest) != previousStore
+            or not isFresh(
+                filename,
+                entry["params"],
+                list(entry["upstream"]),
+                ignore=[storeManifest],
+            )
+        ):
+            continue
+        params = dict(entry["params"])
+        airport = params.pop("airport")
+        groups.setdefault(json.dumps(params, sort_keys=True), {})[airport] = (
+            filename,
+            entry,
+        )
+
+    dform = "%Y-%m-%d %H:%M:%S"
+    updated = set()
+    for key, files in groups.items():
+        params = json.loads(key)
+        startDefault = pd.Timestamp(params["startDefault"])
+        endDefault = pd.Timestamp(params["endDefault"])
+
+        patches = []
+        for year, month in tqdm(months):
+            monthStart = pd.Timestamp(year, month, 1)
+            monthEnd = monthStart + pd.offsets.MonthBegin()
+            if (
+                month not in params["availableMonths"]
+                or monthEnd <= startDefault
+                or monthStart >= endDefault
+            ):
+                continue
+            monthStart = max(monthStart, startDefault)
+            monthEnd = min(monthEnd, endDefault)
+            # A day either side, so flights at the airport in this month are read
+            # the same way as for the full period
+            dataDict = _aggregateNNdata(
+                list(files),
+                params["timeslotLength"],
+                params["catagoricalFlightDuration"],
+                max(monthStart - pd.Timedelta(days=1), startDefault),
+                min(monthEnd + pd.Timedelta(days=1), endDefault),
+                params["availableMonths"],
+                saveFolder,
+            )
+            patches.append((monthStart, monthEnd, dataDict))
+            updated.add((year, month))
+
+        for airport, (filename, entry) in files.items():
+            if patches:
+                # round_trip keeps the months that are not updated exactly as they were saved
+                Pagg = pd.read_csv(
+                    filename, header=0, index_col=0, float_precision="round_trip"
+                )
+                Pagg = Pagg.assign(
+                    timeslot=lambda x: pd.to_datetime(x.timeslot, format=dform)
+                )
+                for monthStart, monthEnd, dataDict in patches:
+                    Pagg = pd.concat(
+                        [
+                            Pagg.query(
+                                "`timeslot` < @monthStart | `timeslot` >= @monthEnd"
+                            ),
+                            dataDict[airport].query(
+                                "`timeslot` >= @monthStart & `timeslot` < @monthEnd"
+                            ),
+                        ]
+                    )
+                Pagg = Pagg.sort_values(by=["timeslot"]).reset_index(drop=True)
+                Pagg.to_csv(filename)
+
+            # Up to date with the new version of the flight store
+            recordArtifact(filename, entry["params"], list(entry["upstream"]))
+
+    return sorted(updated)
+
+
+def readFlightStore(
+    start: datetime,
+    end: datetime,
+    airports: list = None,
+    betweenAirports: bool = False,
+    storeFolder: str = "filteredData/flightStore",
+):
+    """Reads flights from the flight store, only the partitions and rows matching the filters are loaded
+
+    Args:
+        start (datetime): start date to filter for (inclusive).
+        end (datetime): end date to filter for (exclusive).
+        airports (list, optional): list of ICAO codes to filter for, None reads all airports. Defaults to None.
+        betweenAirports (bool, optional): if True only flights between two airports of the list are read,\
+             otherwise all flights arriving or departing at one of them. Defaults to False.
+        storeFolder (str, optional): folder of the flight store. Defaults to "filteredData/flightStore".
+
+    Returns:
+        pd.DataFrame: flights dataframe in the format of extractData
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+
+    # Does NOT include flights that departed the night before but arrived within the filter
+    dateFilter = [("FiledOBT", ">=", start), ("FiledAT", "<", end)]
+
+    # Partition filters for the months between start and end
+    if start.year == end.year:
+        monthFilters = [
+            [
+                ("year", "=", start.year),
+                ("month", ">=", start.month),
+                ("month", "<=", end.month),
+            ]
+        ]
+    else:
+        monthFilters = [
+            [("year", "=", start.year), ("month", ">=", start.month)],
+            [("year", ">", start.year), ("year", "<", end.year)],
+            [("year", "=", end.year), ("month", "<=", end.month)],
+        ]
+
+    if airports is None:
+        airportFilters = [[]]
+    elif betweenAirports:
+        airportFilters = [[("ADEP", "in", airports), ("ADES", "in", airports)]]
+    else:
+        airportFilters = [[("ADEP", "in", airports)], [("ADES", "in", airports)]]
+
+    filters = [
+        monthFilter + airportFilter + dateFilter
+        for monthFilter in monthFilters
+        for airportFilter in airportFilters
+    ]
+
+    # The source files of the flights are only used by updateFlightStore
+    columns = [
+        column for column in flightColumns.values() if column != "ICAOFlightType"
+    ]
+    P = (
+        pd.read_parquet(
+            storeFolder, columns=columns + ["year", "month"], filters=filters
+        )
+        .drop(["year", "month"], axis=1)
+        .sort_values(by=["ECTRLID"])
+        .reset_index(drop=True)
+    )
+
+    return P
+
+
+def generalFilterAirports(
+    start: datetime,
+    end: datetime,
+    airports: list,
+    betweenAirports: bool = False,
     saveFolder: str = "filteredData",
     forceRegenerateData: bool = False,
     startDefault=datetime(2018, 1, 1),
     endDefault=datetime(2019, 12, 31),
 ):
-    """Generate all the flights for a single airport, save and return as dataframe
+    """Generate all the flights for a list of airports and return as dataframe
 
     Args:
         start (datetime): start date to filter for. Dates are inclusive.
         end (datetime): end date to filter for. Dates are inclusive.
-        airport (str): ICAO code for the airport
-        saveFolder (str, optional): target save folder. Defaults to "filteredData".
-        forceRegenerateData (bool, optional): force regeneration of data even if it had already been generated. Defaults to False.
-        startDefault (datetime, optinoal): start date for the csv
-        endDefault (datetime, optinoal): end date for the csv
+        airports (list): list of ICAO codes for the airports
+        betweenAirports (bool, optional): only keep flights between two airports of the list. Defaults to False.
+        saveFolder (str, optional): folder containing the flight store. Defaults to "filteredData".
+        forceRegenerateData (bool, optional): force regeneration of the flight store even if it had already been generated. Defaults to False.
+        startDefault (datetime, optinoal): start date for the flight store
+        endDefault (datetime, optinoal): end date for the flight store
 
     Returns:
         pd.DataFrame: Dataframe with all flights for selected filters
     """
-    file = f"{saveFolder}/general{airport}.csv"
-    dform = "%Y-%m-%d %H:%M:%S"
-    if not os.path.exists(saveFolder):
-        os.makedirs(saveFolder)
-
-    # For the first cold run it generates data for all dates to prevent problems
-    if not os.path.exists(file) or forceRegenerateData:
-        print(f"Generating {airport} airport data from {startDefault} to {endDefault}")
-        P = extractData(startDefault, endDefault)
-        P = P.query("`ADES` == @airport | `ADEP` == @airport")
-        P = calculateDelays(P)
-        P.to_csv(file)
-    else:
-        P = pd.read_csv(file, header=0, index_col=0)
-        # Condvert datetime strings to actual datetime objects
-        P = (
-            P.assign(FiledOBT=lambda x: pd.to_datetime(x.FiledOBT, format=dform))
-            .assign(FiledAT=lambda x: pd.to_datetime(x.FiledAT, format=dform))
-            .assign(ActualOBT=lambda x: pd.to_datetime(x.ActualOBT, format=dform))
-            .assign(ActualAT=lambda x: pd.to_datetime(x.ActualAT, format=dform))
-        )
-
-    # Actual date filter.
-    # Does NOT include flights that departed the night before but arrived within the filter
-    P = P.query("`FiledOBT` >= @start & `FiledAT` < @end")
+    storeFolder = f"{saveFolder}/flightStore"
+    manifestFile = f"{storeFolder}/{flightStoreManifest}"
+
+    # The store holds whole years, the years it already has are kept
+    years = [start.year, end.year, startDefault.year, endDefault.year]
+    entry = artifactEntry(manifestFile)
+    if entry is not None:
+        years += [pd.Timestamp(entry["params"][key]).year for key in ["start", "end"]]
+    storeStart, storeEnd = datetime(min(years), 1, 1), datetime(max(years), 12, 31)
+
+    if forceRegenerateData:
+        print(f"Generating flight store from {storeStart} to {storeEnd}")
+        buildFlightStore(storeStart, storeEnd, storeFolder=storeFolder)
+    elif not isFresh(manifestFile, _flightStoreParams(storeStart, storeEnd, "data")):
+        # For the first cold run it generates data for all dates and airports to prevent problems,
+        # later only the raw files of the years the store does not hold yet are read
+        print(f"Updating flight store from {storeStart} to {storeEnd}")
+        updateFlightStore(storeStart, storeEnd, saveFolder=saveFolder)
+
+    P = readFlightStore(start, end, airports, betweenAirports, storeFolder)
+    P = calculateDelays(P)
 
     return P
 
 
-def generateNNdata(
+def generalFilterAirport(
+    start: datetime,
+    end: datetime,
     airport: str,
+    saveFolder: str = "filteredData",
+    forceRegenerateData: bool = False,
+    startDefault=datetime(2018, 1, 1),
+    endDefault=datetime(2019, 12, 31),
+):
+    """Generate all the flights for a single airport and return as dataframe
+
+    Args:
+        start (datetime): start date to filter for. Dates are inclusive.
+        end (datetime): end date to filter for. Dates are inclusive.
+        airport (str): ICAO code for the airport
+        saveFolder (str, optional): folder containing the flight store. Defaults to "filteredData".
+        forceRegenerateData (bool, optional): force regeneration of the flight store even if it had already been generated. Defaults to False.
+        startDefault (datetime, optinoal): start date for the flight store
+        endDefault (datetime, optinoal): end date for the flight store
+
+    Returns:
+        pd.DataFrame: Dataframe with all flights for selected filters
+    """
+    return generalFilterAirports(
+        start,
+        end,
+        [airport],
+        saveFolder=saveFolder,
+        forceRegenerateData=forceRegenerateData,
+        startDefault=startDefault,
+        endDefault=endDefault,
+    )
+
+
+def _aggregateNNdata(
+    airports: list,
     timeslotLength: int = 15,
-    GNNFormat: bool = False,
-    disableWeather: bool = True,
-    saveFolder: str = "NNData",
     catagoricalFlightDuration: bool = False,
-    forceRegenerateData: bool = False,
-    start: datetime = datetime(2018, 1, 1),
-    end: datetime = datetime(2019, 12, 31),
     startDefault=datetime(2018, 1, 1),
     endDefault=datetime(2019, 12, 31),
     availableMonths: list = [3, 6, 9, 12],
+    saveFolder: str = "filteredData",
 ):
-    """Aggregates all flights at a single airport by a certain timeslot.
+    """Aggregates the flights of several airports by timeslot in a single pass over the flights.
 
     Args:
-        airport (str): ICAO code for a single airport
+        airports (list): list of ICAO airport codes
         timeslotLength (int, optional): length to aggregate flights for in minutes. Defaults to 15 minutes.
-        GNNFormat: (bool, optional): returns the data in format used for GNN model (Pagg, Y, T). Defaults to False
-        disableWeather: (bool, optional): disables weather features:\
-             (["timeslot", "visibility", "windspeed",\
-               "temperature", "frozenprecip", \
-               "surfaceliftedindex", "cape"]). Defaults to True.
-        saveFolder (str, optional): folder to save data in. Defaults to "NNData".
-        catagoricalFlightDelay (bool, optional): If false, flight delay is presented as average.\
+        catagoricalFlightDuration (bool, optional): If false, flight delay is presented as average.\
              If True it is generated as bins from 0-3, 3-6 and >6. Defaults to False.
-        forceRegenerateData (bool, optional): force regeneration of data even if it had already been generated. Defaults to False.
-        start (datetime, optional): start date to filter for.
-        end (datetime, optional): end date to filter for.
-        startDefault (datetime, optinoal): start date to generate full data. Defaults to datetime(2019, 1, 31)
+        startDefault (datetime, optinoal): start date to generate full data. Defaults to datetime(2018, 1, 1)
         endDefault (datetime, optinoal): end date to generate full data. Defaults to datetime(2019, 12, 31)
         availableMonths (list, optional): list of months available in \
             eurocontrol. Defaults to [March, June, September, December]
+        saveFolder (str, optional): folder containing the flight store. Defaults to "filteredData".
+
     Returns:
-        pd.Dataframe: pandas dataframe with aggregate flight data, unscaled.
+        dict: dictionary of unscaled NN dataframes with ICAO codes as keys, in the format saved by generateNNdata
     """
-    filename = f"{saveFolder}/{airport}_{timeslotLength}m.csv"
-
-    dform = "%Y-%m-%d %H:%M:%S"
-    if not os.path.exists(saveFolder):
-        os.makedirs(saveFolder)
-
-    if not os.path.exists(filename) or forceRegenerateData:
-        print(
-            f"Generating NN data for {airport} with a timeslot length of {timeslotLength} minutes"
-        )
-        P = generalFilterAirport(startDefault, endDefault, airport)
-
-        # Temporary untill weather is added:
-        numRunways = 0
-        numGates = 0
-
-        ### Data preparation for agg function
-        # Are flights arriving or departing?
-        P["arriving"] = P.ADES == airport
-        P["departing"] = P.ADEP == airport
-
-        # Is it a low cost flight?
-        P["lowcost"] = P.FlightType != "Traditional Scheduled"
-
-        # Planned Flight Duration (PFD) in minutes
-        P["PFD"] = P["FiledAT"] - P["FiledOBT"]
-        P["PFD"] = (
-            P["PFD"].dt.components["hours"] * 60 + P["PFD"].dt.components["minutes"]
-        )
+    P = generalFilterAirports(startDefault, endDefault, airports, saveFolder=saveFolder)
+
+    # Temporary untill weather is added:
+    numRunways = 0
+    numGates = 0
+
+    ### Data preparation for agg function
+    # Every flight gets a row for each of its airports in the list,
+    # so a flight between two of the airports counts as arriving at one and departing at the other
+    P = pd.concat(
+        [
+            P.loc[P.ADES.isin(airports)].assign(
+                airport=lambda x: x.ADES, arriving=True
+            ),
+            P.loc[P.ADEP.isin(airports)].assign(
+                airport=lambda x: x.ADEP, arriving=False
+            ),
+        ],
+        ignore_index=True,
+    )
 
-        # Flight duration for arriving airplanes
-        P.loc[(P.arriving == False), "departuresFlightDuration"] = P.PFD
-        P.loc[(P.arriving == True), "arrivalsFlightDuration"] = P.PFD
+    # Are flights arriving or departing?
+    P["departing"] = ~P.arriving
 
-        P["departuresFlightDuration0to3"] = P.departuresFlightDuration < 3 * 60
-        P["departuresFlightDuration3to6"] = (P.departuresFlightDuration >= 3 * 60) & (
-            P.departuresFlightDuration < 6 * 60
-        )
-        P["departuresFlightDuration6orMore"] = P.departuresFlightDuration >= 6 * 60
+    # Is it a low cost flight?
+    P["lowcost"] = P.FlightType != "Traditional Scheduled"
 
-        P["arrivalsFlightDuration0to3"] = P.arrivalsFlightDuration < 3 * 60
-        P["arrivalsFlightDuration3to6"] = (P.arrivalsFlightDuration >= 3 * 60) & (
-            P.arrivalsFlightDuration < 6 * 60
-        )
-        P["arrivalsFlightDuration6orMore"] = P.arrivalsFlightDuration >= 6 * 60
+    # Planned Flight Duration (PFD) in minutes
+    P["PFD"] = P["FiledAT"] - P["FiledOBT"]
+    P["PFD"] = P["PFD"].dt.components["hours"] * 60 + P["PFD"].dt.components["minutes"]
 
-        # Delay metrics for arriving and departing airports
-        P.loc[(P.arriving == True), "arrivalsDepartureDelay"] = P.DepartureDelay
-        P.loc[(P.arriving == True), "arrivalsArrivalDelay"] = P.ArrivalDelay
-        P.loc[(P.arriving == False), "departuresDepartureDelay"] = P.DepartureDelay
-        P.loc[(P.arriving == False), "departuresArrivalDelay"] = P.ArrivalDelay
+    # Flight duration for arriving airplanes
+    P.loc[(P.arriving == False), "departuresFlightDuration"] = P.PFD
+    P.loc[(P.arriving == True), "arrivalsFlightDuration"] = P.PFD
 
-        # Collect the time at which the flights are meant to be at the airport
-        P.loc[(P.arriving == True), "timeAtAirport"] = P.FiledAT
-        P.loc[(P.arriving == False), "timeAtAirport"] = P.FiledOBT
-
-        # This creates a new index to ensure that we have no gaps in the timeslots later
-        def daterange(start_date, end_date):
-            delta = timedelta(minutes=timeslotLength)
-            while start_date < end_date:
-                if start_date.month in availableMonths:
-                    # Only yields the months for which we have
-                    # data specified in the argument availableMonths
-                    yield start_date
-                start_date += delta
+    P["departuresFlightDuration0to3"] = P.departuresFlightDuration < 3 * 60
+    P["departuresFlightDuration3to6"] = (P.departuresFlightDuration >= 3 * 60) & (
+        P.departuresFlightDuration < 6 * 60
+    )
+    P["departuresFlightDuration6orMore"] = P.departuresFlightDuration >= 6 * 60
 
-        denseDateIndex = daterange(startDefault, endDefault)
+    P["arrivalsFlightDuration0to3"] = P.arrivalsFlightDuration < 3 * 60
+    P["arrivalsFlightDuration3to6"] = (P.arrivalsFlightDuration >= 3 * 60) & (
+        P.arrivalsFlightDuration < 6 * 60
+    )
+    P["arrivalsFlightDuration6orMore"] = P.arrivalsFlightDuration >= 6 * 60
+
+    # Delay metrics for arriving and departing airports
+    P.loc[(P.arriving == True), "arrivalsDepartureDelay"] = P.DepartureDelay
+    P.loc[(P.arriving == True), "arrivalsArrivalDelay"] = P.ArrivalDelay
+    P.loc[(P.arriving == False), "departuresDepartureDelay"] = P.DepartureDelay
+    P.loc[(P.arriving == False), "departuresArrivalDelay"] = P.ArrivalDelay
+
+    # Collect the time at which the flights are meant to be at the airport
+    P.loc[(P.arriving == True), "timeAtAirport"] = P.FiledAT
+    P.loc[(P.arriving == False), "timeAtAirport"] = P.FiledOBT
+
+    # This creates a new index to ensure that we have no gaps in the timeslots later
+    denseDateIndex = timeslotCalendar(
+        startDefault, endDefault, timeslotLength, availableMonths
+    ).rename("timeAtAirport")
+
+    ### get aggregate features for rolling window of all airports at once
+    Pagg = P.groupby(
+        [
+            "airport",
+            pd.Grouper(key="timeAtAirport", freq=f"{timeslotLength}min"),
+        ]
+    ).agg(
+        {
+            "departing": "sum",
+            "arriving": "sum",
+            "lowcost": "mean",
+            "arrivalsFlightDuration": "mean",
+            "arrivalsDepartureDelay": "mean",
+            "arrivalsArrivalDelay": "mean",
+            "departuresFlightDuration": "mean",
+            "departuresDepartureDelay": "mean",
+            "departuresArrivalDelay": "mean",
+            "departuresFlightDuration0to3": "mean",
+            "departuresFlightDuration3to6": "mean",
+            "departuresFlightDuration6orMore": "mean",
+            "arrivalsFlightDuration0to3": "mean",
+            "arrivalsFlightDuration3to6": "mean",
+            "arrivalsFlightDuration6orMore": "mean",
+        }
+    )
+    airportAggs = dict(list(Pagg.groupby(level="airport")))
 
+    dataDict = {}
+    for airport in airports:
         # Functionality for airports outside of the top50
         if airport in list(airport_dict.keys()):
             airportCapacity = airport_dict[airport]["capacity"]
@@ -367,32 +1422,10 @@ def generateNNdata(
 
         weatherData = fetch_weather_data(airport, timeslotLength)
 
-        ### get aggregate features for rolling window
-        Pagg = (
-            P.groupby(
-                [
-                    pd.Grouper(key="timeAtAirport", freq=f"{timeslotLength}min"),
-                ]
-            )
-            .agg(
-                {
-                    "departing": "sum",
-                    "arriving": "sum",
-                    "lowcost": "mean",
-                    "arrivalsFlightDuration": "mean",
-                    "arrivalsDepartureDelay": "mean",
-                    "arrivalsArrivalDelay": "mean",
-                    "departuresFlightDuration": "mean",
-                    "departuresDepartureDelay": "mean",
-                    "departuresArrivalDelay": "mean",
-                    "departuresFlightDuration0to3": "mean",
-                    "departuresFlightDuration3to6": "mean",
-                    "departuresFlightDuration6orMore": "mean",
-                    "arrivalsFlightDuration0to3": "mean",
-                    "arrivalsFlightDuration3to6": "mean",
-                    "arrivalsFlightDuration6orMore": "mean",
-                }
-            )
+        airportAgg = airportAggs.get(airport, Pagg.iloc[:0]).droplevel("airport")
+
+        airportAgg = (
+            airportAgg
             # This ensure that there are no timeslot gaps
             # at the start and end of the dataframe
             .reindex(denseDateIndex, fill_value=0)
@@ -421,18 +1454,18 @@ def generateNNdata(
         )
 
         # turn boolean columns into 1 and 0
-        boolCols = Pagg.columns[Pagg.dtypes.eq(bool)]
-        Pagg.loc[:, boolCols] = Pagg.loc[:, boolCols].astype(int)
+        boolCols = airportAgg.columns[airportAgg.dtypes.eq(bool)]
+        airportAgg.loc[:, boolCols] = airportAgg.loc[:, boolCols].astype(int)
 
         # there are two ways the team wanted the flight
         # duration in bins of 3 hours or as an average,
         # here the data gets augmented based on the chase
         if catagoricalFlightDuration:
-            Pagg = Pagg.drop(
+            airportAgg = airportAgg.drop(
                 ["departuresFlightDuration", "arrivalsFlightDuration"], axis=1
             )
         else:
-            Pagg = Pagg.drop(
+            airportAgg = airportAgg.drop(
                 [
                     "departuresFlightDuration0to3",
                     "departuresFlightDuration3to6",
@@ -444,12 +1477,32 @@ def generateNNdata(
                 axis=1,
             )
 
-        Pagg.to_csv(filename)
+        dataDict[airport] = airportAgg
 
-    else:
-        Pagg = pd.read_csv(filename, header=0, index_col=0)
-        Pagg = Pagg.assign(timeslot=lambda x: pd.to_datetime(x.timeslot, format=dform))
+    return dataDict
 
+
+def _formatNNdata(
+    Pagg: pd.DataFrame,
+    GNNFormat: bool = False,
+    disableWeather: bool = True,
+    catagoricalFlightDuration: bool = False,
+    start: datetime = datetime(2018, 1, 1),
+    end: datetime = datetime(2019, 12, 31),
+):
+    """Filters an aggregated NN dataframe to the requested dates and features.
+
+    Args:
+        Pagg (pd.DataFrame): aggregated NN dataframe as saved by generateNNdata
+        GNNFormat: (bool, optional): returns the data in format used for GNN model (Pagg, Y, T). Defaults to False
+        disableWeather: (bool, optional): disables weather features. Defaults to True.
+        catagoricalFlightDuration (bool, optional): whether Pagg contains the flight duration bins. Defaults to False.
+        start (datetime, optional): start date to filter for.
+        end (datetime, optional): end date to filter for.
+
+    Returns:
+        pd.Dataframe: pandas dataframe with aggregate flight data, or (Pagg, Y, T) in GNNFormat
+    """
     Pagg = Pagg.query("`timeslot` >= @start & `timeslot` < @end")
 
     if disableWeather:
@@ -485,6 +1538,138 @@ def generateNNdata(
         return Pagg
 
 
+def nnDataArtifact(
+    airport: str,
+    timeslotLength: int,
+    saveFolder: str = "NNData",
+    catagoricalFlightDuration: bool = False,
+    startDefault=datetime(2018, 1, 1),
+    endDefault=datetime(2019, 12, 31),
+    availableMonths: list = [3, 6, 9, 12],
+    filteredFolder: str = "filteredData",
+):
+    """File of the NN data of an airport, with the parameters and upstream files it is generated from, see isFresh.\
+        The filename holds a hash of the parameters and the flight store, so data generated with other parameters\
+        or from another flight store is kept next to it.
+
+    Args:
+        airport (str): ICAO code for a single airport
+        timeslotLength (int): length to aggregate flights for in minutes
+        saveFolder (str, optional): folder the NN data is saved in. Defaults to "NNData".
+        catagoricalFlightDuration (bool, optional): see generateNNdata. Defaults to False.
+        startDefault (datetime, optinoal): start date of the full data. Defaults to datetime(2018, 1, 1)
+        endDefault (datetime, optinoal): end date of the full data. Defaults to datetime(2019, 12, 31)
+        availableMonths (list, optional): list of months available in eurocontrol. Defaults to [3, 6, 9, 12].
+        filteredFolder (str, optional): folder containing the flight store it is generated from. Defaults to "filteredData".
+
+    Returns:
+        tuple: filename, parameters and upstream files
+    """
+    params = {
+        "airport": airport,
+        "timeslotLength": timeslotLength,
+        "catagoricalFlightDuration": catagoricalFlightDuration,
+        "startDefault": startDefault,
+        "endDefault": endDefault,
+        "availableMonths": availableMonths,
+    }
+    key = json.dumps(
+        {
+            **{name: value for name, value in params.items() if name != "airport"},
+            "filteredFolder": os.path.normpath(filteredFolder),
+        },
+        default=str,
+        sort_keys=True,
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    filename = f"{saveFolder}/{airport}_{timeslotLength}m_{digest}.csv"
+    upstream = [flightStoreManifestFile(filteredFolder)] + [
+        weather_file(airport, year, timeslotLength) for year in [2019, 2018]
+    ]
+    return filename, params, upstream
+
+
+def generateNNdata(
+    airport: str,
+    timeslotLength: int = 15,
+    GNNFormat: bool = False,
+    disableWeather: bool = True,
+    saveFolder: str = "NNData",
+    catagoricalFlightDuration: bool = False,
+    forceRegenerateData: bool = False,
+    start: datetime = datetime(2018, 1, 1),
+    end: datetime = datetime(2019, 12, 31),
+    startDefault=datetime(2018, 1, 1),
+    endDefault=datetime(2019, 12, 31),
+    availableMonths: list = [3, 6, 9, 12],
+    filteredFolder: str = "filteredData",
+):
+    """Aggregates all flights at a single airport by a certain timeslot.
+
+    Args:
+        airport (str): ICAO code for a single airport
+        timeslotLength (int, optional): length to aggregate flights for in minutes. Defaults to 15 minutes.
+        GNNFormat: (bool, optional): returns the data in format used for GNN model (Pagg, Y, T). Defaults to False
+        disableWeather: (bool, optional): disables weather features:\
+             (["timeslot", "visibility", "windspeed",\
+               "temperature", "frozenprecip", \
+               "surfaceliftedindex", "cape"]). Defaults to True.
+        saveFolder (str, optional): folder to save data in. Defaults to "NNData".
+        catagoricalFlightDelay (bool, optional): If false, flight delay is presented as average.\
+             If True it is generated as bins from 0-3, 3-6 and >6. Defaults to False.
+        forceRegenerateData (bool, optional): force regeneration of data even if it is up to date.\
+             Data generated with other parameters or from older flights or weather is always regenerated. Defaults to False.
+        start (datetime, optional): start date to filter for.
+        end (datetime, optional): end date to filter for.
+        startDefault (datetime, optinoal): start date to generate full data. Defaults to datetime(2019, 1, 31)
+        endDefault (datetime, optinoal): end date to generate full data. Defaults to datetime(2019, 12, 31)
+        availableMonths (list, optional): list of months available in \
+            eurocontrol. Defaults to [March, June, September, December]
+        filteredFolder (str, optional): folder containing the flight store. Defaults to "filteredData".
+    Returns:
+        pd.Dataframe: pandas dataframe with aggregate flight data, unscaled.
+    """
+    filename, params, upstream = nnDataArtifact(
+        airport,
+        timeslotLength,
+        saveFolder,
+        catagoricalFlightDuration,
+        startDefault,
+        endDefault,
+        availableMonths,
+        filteredFolder,
+    )
+
+    dform = "%Y-%m-%d %H:%M:%S"
+    if not os.path.exists(saveFolder):
+        os.makedirs(saveFolder)
+
+    if forceRegenerateData or not isFresh(filename, params, upstream):
+        print(
+            f"Generating NN data for {airport} with a timeslot length of {timeslotLength} minutes"
+        )
+        Pagg = _aggregateNNdata(
+            [airport],
+            timeslotLength,
+            catagoricalFlightDuration,
+            startDefault,
+            endDefault,
+            availableMonths,
+            filteredFolder,
+        )[airport]
+
+        Pagg.to_csv(filename)
+        recordArtifact(filename, params, upstream)
+
+    else:
+        Pagg = pd.read_csv(filename, header=0, index_col=0)
+        Pagg = Pagg.assign(timeslot=lambda x: pd.to_datetime(x.timeslot, format=dform))
+
+    return _formatNNdata(
+        Pagg, GNNFormat, disableWeather, catagoricalFlightDuration, start, end
+    )
+
+
 def generateNNdataMultiple(
     airports: list,
     timeslotLength: int = 15,
@@ -494,6 +1679,9 @@ def generateNNdataMultiple(
     forceRegenerateData: bool = False,
     start: datetime = datetime(2018, 1, 1),
     end: datetime = datetime(2019, 12, 31),
+    batched: bool = True,
+    stacked: bool = False,
+    filteredFolder: str = "filteredData",
 ):
     """Generates NN data for many airports and results all as a dict
 
@@ -506,30 +1694,85 @@ def generateNNdataMultiple(
                         "temperature", "frozenprecip", \
                         "surfaceliftedindex", "cape"]). Defaults to True.
         saveFolder (str, optional): folder to save data in. Defaults to "NNData".
-        forceRegenerateData (bool, optional): force regeneration of data even if it had already been generated. Defaults to False.
+        forceRegenerateData (bool, optional): force regeneration of data even if it is up to date. Defaults to False.
         start (datetime, optional): start date to filter for.
         end (datetime, optional): end date to filter for.
+        batched (bool, optional): aggregate all airports that are not cached yet in a single pass\
+             over the flights instead of one pass per airport. Defaults to True.
+        stacked (bool, optional): return stacked numpy arrays (X, Y, T) with X of shape\
+             timeslots x airports x features and Y of shape timeslots x airports x labels,\
+             only available in GNNFormat. Defaults to False.
+        filteredFolder (str, optional): folder containing the flight store. Defaults to "filteredData".
 
     Returns:
         dict: dictionary of NN data dataframes
     """
+    if stacked and not GNNFormat:
+        raise ValueError("stacked is only available in GNNFormat")
+
+    if not os.path.exists(saveFolder):
+        os.makedirs(saveFolder)
+
+    generated = {}
+    if batched:
+        missing = [
+            airport
+            for airport in airports
+            if forceRegenerateData
+            or not isFresh(
+                *nnDataArtifact(
+                    airport, timeslotLength, saveFolder, filteredFolder=filteredFolder
+                )
+            )
+        ]
+        if missing:
+            print(
+                f"Generating NN data for {len(missing)} airports with a timeslot length of {timeslotLength} minutes"
+            )
+            generated = _aggregateNNdata(
+                missing, timeslotLength, saveFolder=filteredFolder
+            )
+            for airport, Pagg in generated.items():
+                filename, params, upstream = nnDataArtifact(
+                    airport, timeslotLength, saveFolder, filteredFolder=filteredFolder
+                )
+                Pagg.to_csv(filename)
+                recordArtifact(filename, params, upstream)
+
     dataDict = {}
     for airport in tqdm(airports):
-        result = generateNNdata(
-            airport,
-            timeslotLength,
-            GNNFormat,
-            disableWeather,
-            saveFolder,
-            forceRegenerateData,
-            start=start,
-            end=end,
-        )
+        if airport in generated:
+            result = _formatNNdata(
+                generated[airport], GNNFormat, disableWeather, start=start, end=end
+            )
+        else:
+            result = generateNNdata(
+                airport,
+                timeslotLength,
+                GNNFormat,
+                disableWeather,
+                saveFolder,
+                forceRegenerateData=forceRegenerateData,
+                start=start,
+                end=end,
+                filteredFolder=filteredFolder,
+            )
         if GNNFormat:
             result = {"X": result[0], "Y": result[1], "T": result[2]}
 
         dataDict[airport] = result
 
+    if stacked:
+        # timeslots x airports x features
+        X = np.stack(
+            [dataDict[airport]["X"].to_numpy() for airport in airports], axis=1
+        )
+        Y = np.stack(
+            [dataDict[airport]["Y"].to_numpy() for airport in airports], axis=1
+        )
+        T = dataDict[airports[0]]["T"]
+        return X, Y, T
+
     return dataDict
 
 
@@ -614,9 +1857,17 @@ def generateKeplerData(
     """
     airports_data = pd.DataFrame() # Dataframe for data of all the airports
     flights_all = pd.DataFrame() # Dataframe for all flight data
+
+    # This creates a new index to ensure that we have no gaps in the timeslots later
+    denseDateIndex = timeslotCalendar(
+        start, end, timeslotLength, availableMonths
+    ).rename("Timeslot")
+
+    # Only flights between the airports are used, so they are read in one go
+    Pall = generalFilterAirports(start, end, airports, betweenAirports=True)
     for airport in tqdm(airports):
 
-        P = generalFilterAirport(start, end, airport)
+        P = Pall.query("`ADES` == @airport | `ADEP` == @airport").copy()
         P["lowcost"] = P.FlightType != "Traditional Scheduled"
         P["Traditional Scheduled"] = P.FlightType == "Traditional Scheduled"
 
@@ -657,18 +1908,6 @@ def generateKeplerData(
 
         flights_all = flights_all.append(flights_data)
 
-        # This creates a new index to ensure that we have no gaps in the timeslots later
-        def daterange(start_date, end_date):
-            delta = timedelta(minutes=timeslotLength)
-            while start_date < end_date:
-                if start_date.month in availableMonths:
-                    # Only yields the months for which we have
-                    # data specified in the argument availableMonths
-                    yield start_date
-                start_date += delta
-
-        denseDateIndex = daterange(start, end)
-
         P = P.query("`ADEP` in @airports & `ADES` in @airports")
         Pagg = (
             P.groupby(
@@ -737,4 +1976,11 @@ def generateKeplerData(
 
 
 if __name__ == "__main__":
-    pass
+    # Monthly refresh after new eurocontrol files were added to the data folder
+    updateFlightStore()
+
+    # Cached files that are not recorded in the cache manifest are no longer used, but files generated before
+    # the manifest existed are not recorded either. They are only listed unless --evict is passed
+    evict = "--evict" in sys.argv[1:]
+    for filename in evictOrphans(dryRun=not evict):
+        print(f"{'Evicted' if evict else 'Not recorded'} {filename}")
@@ -4,20 +4,126 @@ from .extractionvalues import *
 # from .airportvalues import *
 from extraction.extractionvalues import ICAOTOP50
 from . import extract
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import lru_cache
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 
 from regressionModels.tool_box import haversine
 
 
+def adjacencyCounts(
+    P: pd.DataFrame, airports: list, dateList: pd.DatetimeIndex, timeslotLength: int
+) -> tuple:
+    """Count the flights between airports for each timeslot
+
+    Args:
+        P (pd.DataFrame): flights with ADEP, ADES and FiledAT columns
+        airports (list): list of airports by ICAO code, gives the node id of each airport
+        dateList (pd.DatetimeIndex): timeslots to count, gives the slot id of each timeslot
+        timeslotLength (int): length of timeslot to aggregate by in minutes
+
+    Returns:
+        tuple: timeslot, ADES and ADEP ids and flight count of every nonzero entry, sorted by timeslot
+    """
+    # integer ids of the timeslots and airports, flights outside of them are dropped
+    slot = dateList.get_indexer(P.FiledAT.dt.floor(f"{timeslotLength}min"))
+    ades = pd.Categorical(P.ADES, categories=airports).codes.astype(np.int64)
+    adep = pd.Categorical(P.ADEP, categories=airports).codes.astype(np.int64)
+    keep = (slot >= 0) & (ades >= 0) & (adep >= 0)
+
+    # count every (timeslot, ADES, ADEP) combination at once
+    n = len(airports)
+    flat, counts = np.unique(
+        (slot[keep] * n + ades[keep]) * n + adep[keep], return_counts=True
+    )
+    slot, rest = np.divmod(flat, n * n)
+    ades, adep = np.divmod(rest, n)
+
+    return slot, ades, adep, counts
+
+
+def adjacencyMaximum(
+    ades: np.ndarray,
+    adep: np.ndarray,
+    counts: np.ndarray,
+    nAirports: int,
+    chunkSize: int = 10**7,
+) -> np.ndarray:
+    """Maximum flight count of every airport pair over all timeslots, used to normalise the adjacency matrices
+
+    Args:
+        ades (np.ndarray): ADES id of every nonzero entry
+        adep (np.ndarray): ADEP id of every nonzero entry
+        counts (np.ndarray): flight count of every nonzero entry
+        nAirports (int): amount of airports
+        chunkSize (int, optional): entries to read at once, keeps memory mapped counts out of memory. Defaults to 10**7.
+
+    Returns:
+        np.ndarray: Nairports x Nairports array, 1 for airport pairs without flights
+    """
+    maximum = np.zeros((nAirports, nAirports), dtype=counts.dtype)
+    for i in range(0, len(counts), chunkSize):
+        np.maximum.at(
+            maximum,
+            (ades[i : i + chunkSize], adep[i : i + chunkSize]),
+            counts[i : i + chunkSize],
+        )
+    return np.where(maximum > 0, maximum, 1)
+
+
+def adjacencyFromCounts(
+    slot: np.ndarray,
+    ades: np.ndarray,
+    adep: np.ndarray,
+    counts: np.ndarray,
+    nTimeslots: int,
+    nAirports: int,
+    sparse: bool = False,
+):
+    """Build the normalised adjacency matrices from the flight counts of adjacencyCounts
+
+    Args:
+        slot (np.ndarray): timeslot id of every nonzero entry, sorted
+        ades (np.ndarray): ADES id of every nonzero entry
+        adep (np.ndarray): ADEP id of every nonzero entry
+        counts (np.ndarray): flight count of every nonzero entry
+        nTimeslots (int): amount of timeslots
+        nAirports (int): amount of airports
+        sparse (bool, optional): return a sparse COO matrix for each timeslot instead of one dense array. Defaults to False.
+
+    Returns:
+        np.ndarry: Nairports x Nairports x amount array of adjacency matrices
+        (list of Nairports x Nairports scipy.sparse.coo_matrix if sparse)
+    """
+    # Normalise the matrix by the maximum of each airport pair
+    n = nAirports
+    new_max = adjacencyMaximum(ades, adep, counts, nAirports)
+
+    if sparse:
+        values = counts / new_max[ades, adep]
+        bounds = np.searchsorted(slot, np.arange(nTimeslots + 1))
+        return [
+            sp.coo_matrix(
+                (values[a:b], (ades[a:b], adep[a:b])), shape=(n, n), dtype=np.float64
+            )
+            for a, b in zip(bounds[:-1], bounds[1:])
+        ]
+
+    A = np.zeros((nTimeslots, n, n), dtype=counts.dtype)
+    A[slot, ades, adep] = counts
+    return np.divide(A, new_max)
+
+
 def getAdjacencyMatrix(
     airports: list,
     start: datetime = datetime(2018, 3, 1),
     end: datetime = datetime(2019, 12, 31),
     timeslotLength: int = 60,
     debug: bool = False,
-) -> np.ndarray:
+    sparse: bool = False,
+):
     """Generate adjacency matrix for the spektral dataset based on flights between airports
 
     Args:
@@ -26,88 +132,59 @@ def getAdjacencyMatrix(
         end (datetime, optional): start date to consider (inclusive). Defaults to datetime(2019, 12, 31).
         timeslotLength (int, optional): length of timeslot to aggregate by in minutes. Defaults to 60.
         debug (bool, optional): print out some lines to troubleshoot the function. Defaults to False.
+        sparse (bool, optional): return a sparse COO matrix for each timeslot instead of one dense array. Defaults to False.
 
     Returns:
         np.ndarry: Nairports x Nairports x amount array of adjacency matrices
+        (list of Nairports x Nairports scipy.sparse.coo_matrix if sparse)
 
     """
-    # Create a list with all times for multiindex later:
-    def daterange(start: datetime, end: datetime):
-        """Generator that yields a list of timeslots to conform the index by
-
-        Args:
-            start (datetime): start date
-            end (datetime): end date
-
-        Yields:
-            list: list of timeslots for index
-        """
-        delta = timedelta(minutes=timeslotLength)
-        while start < end:
-            yield start
-            start += delta
-
-    dateList = daterange(start, end)
-
-    P = pd.DataFrame()  # start an empty df
-    for airport in airports:
-        # generate filtered data
-        Ptemp = extract.generalFilterAirport(start, end, airport)
-        Ptemp = extract.filterAirports(Ptemp, airports)
-        Ptemp = Ptemp.drop(
-            [
-                "ACType",
-                "ACOperator",
-                "FlightType",
-                "ActualDistanceFlown",
-                "ECTRLID",
-                "ADEPLat",
-                "ADEPLong",
-                "ADESLat",
-                "ADESLong",
-                "ActualOBT",
-                "ActualAT",
-                "ArrivalDelay",
-                "DepartureDelay",
-            ],
-            axis=1,
-        )
+    # Create a list with all times:
+    dateList = extract.timeslotCalendar(start, end, timeslotLength)
 
-        P = pd.concat([P, Ptemp])
+    # generate filtered data, only flights between the airports are needed
+    P = extract.generalFilterAirports(start, end, airports, betweenAirports=True)
 
-    # initial step to get the flights between airports
-    P = (
-        P.groupby([pd.Grouper(key="FiledAT", freq=f"{timeslotLength}min"), "ADES"])[
-            "ADEP"
-        ]
-        .value_counts()
-        .unstack(fill_value=0)
+    final_matrix = adjacencyFromCounts(
+        *adjacencyCounts(P, airports, dateList, timeslotLength),
+        nTimeslots=len(dateList),
+        nAirports=len(airports),
+        sparse=sparse,
     )
 
-    # generate multindex format we want: an adjacency matrix
-    adjacencyFormat = pd.MultiIndex.from_product([dateList, airports])
-
-    # apply the multindex format and sort the columns by airports list
-    P = P.reindex(adjacencyFormat, fill_value=0)[airports]
-    # Generate numpy adjacency matrix in 3d format
-    A = P.to_numpy().reshape(-1, len(airports), len(airports))
-
-    # Normalise the matrix
-    maximum = np.amax(A, axis=0)
-    new_max = np.where(maximum > 0, maximum, 1 )
-    final_matrix = np.divide(A, new_max)
-
     if debug:
         dp = 7
         print(airports)
-        print(P.iloc[int(dp * len(airports)) : int(dp * len(airports)) + len(airports)])
-        print(P.index.get_level_values(0).unique()[dp])
-        print(final_matrix[dp])
-        print(final_matrix.shape)
+        print(dateList[dp])
+        print(final_matrix[dp].toarray() if sparse else final_matrix[dp])
+        print(len(final_matrix) if sparse else final_matrix.shape)
 
     return final_matrix
 
 
+@lru_cache(maxsize=32)
+def _distanceMatrix(airports: tuple) -> np.ndarray:
+    longitude = np.array([airport_dict[airport]["longitude"] for airport in airports])
+    latitude = np.array([airport_dict[airport]["latitude"] for airport in airports])
+
+    # broadcasting airports against themselves gives all pairs at once
+    return haversine(
+        (longitude[:, None], latitude[:, None]), (longitude[None, :], latitude[None, :])
+    )
+
+
+def distanceMatrix(airports: list) -> np.ndarray:
+    """Great-circle distance between every pair of airports, memoized per list of airports
+
+    Args:
+        airports (list): List of ICAO airport strings
+
+    Returns:
+        np.ndarray: Nairports x Nairports array of distances in km
+    """
+    return _distanceMatrix(tuple(airports)).copy()
+
+
 def distance_weight_adjacency(airports, threshold=1000):
     """Generates a weight matrix where each entry is filled with a weight representation
     of the distance between two airports
@@ -120,19 +197,7 @@ def distance_weight_adjacency(airports, threshold=1000):
     Returns:
         np.ndarray: Square numpy array
     """
-    D = np.zeros((len(airports), len(airports)))
-    threshold = 1000
-    for i, airport1 in enumerate(airports):
-        for j, airport2 in enumerate(airports):
-            coords1 = (
-                airport_dict[airport1]["longitude"],
-                airport_dict[airport1]["latitude"],
-            )
-            coords2 = (
-                airport_dict[airport2]["longitude"],
-                airport_dict[airport2]["latitude"],
-            )
-            D[i, j] = haversine(coords1, coords2)
+    D = distanceMatrix(airports)
 
     st_dev = np.std(D)
     D = np.where(D < threshold, np.exp(-(D ** 2) / st_dev ** 2), 0)
@@ -7,7 +7,35 @@ import matplotlib.pyplot as plt
 import requests
 from tqdm import tqdm
 from extraction.airportvalues import airport_dict
+from extraction.cachemanifest import isFresh, artifactEntry, recordArtifact
 from glob import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+import threading
+
+# Location of the GFS analysis data
+GFS_URL = (
+    "https://www.ncei.noaa.gov/data/global-forecast-system/access/historical/analysis/"
+)
+
+# Folder where the grib files are downloaded to
+GRIB_FOLDER = "./data/grib/"
+
+# Folder with the filtered weather data
+WEATHER_FOLDER = "./data/Weather_Data_Filtered"
+
+# Weather variables that are taken from the GFS data
+WEATHER_VARIABLES = ["vis", "gust", "t", "cpofp", "lftx", "cape"]
+
+# Grid points kept from the GFS data: latitude 69 to 31 and longitude -9 to 59
+GRID_SHAPE = (39, 69)
+
+# Upper bound on the memory used by the frames cached by fetch_weather_data
+WEATHER_CACHE_BYTES = 512 * 1024**2
+
+# (airport, interval, years) -> weather dataframe, least recently used first
+_weather_cache = OrderedDict()
+_weather_cache_lock = threading.Lock()
 
 
 def basic_data_reader(
@@ -62,7 +90,250 @@ def basic_data_reader(
         plt.clf()
 
 
-def fetch_grb(year, month, day, hour, pred=0, plot_data: bool = False):
+def grid_file(variable: str, year: int):
+    """Location of the binary weather grid of a variable for a year
+
+    Args:
+        variable (str): weather variable, such as 'gust'
+        year (int): year of the grid
+
+    Returns:
+        str: file location of the grid
+    """
+    return f"{WEATHER_FOLDER}/{variable}/{year}/{variable}_{year}.npy"
+
+
+def grid_index(year: int, month: int, day: int, hour: int):
+    """Time index of a synoptic hour (0, 6, 12 or 18) in the weather grid of a year
+
+    Args:
+        year (int): year
+        month (int): month
+        day (int): day
+        hour (int): hour (only 0, 6, 12 and 18)
+
+    Returns:
+        int: index on the time axis of the grid
+    """
+    day_of_year = datetime(year, month, day).timetuple().tm_yday
+    return (day_of_year - 1) * 4 + hour // 6
+
+
+def open_grid(variable: str, year: int, mode: str = "r"):
+    """Opens the weather grid of a variable for a year as memory mapped array of shape time x lat x lon.\
+        The time axis holds the four synoptic hours of every day of the year, missing hours are NaN.
+
+    Args:
+        variable (str): weather variable, such as 'gust'
+        year (int): year of the grid
+        mode (str, optional): memory map mode, 'r+' creates the grid if it does not exist yet. Defaults to "r".
+
+    Returns:
+        np.memmap: memory mapped weather grid
+    """
+    fileloc = grid_file(variable, year)
+    if mode == "r+" and not os.path.exists(fileloc):
+        os.makedirs(os.path.dirname(fileloc), exist_ok=True)
+        n_hours = (datetime(year + 1, 1, 1) - datetime(year, 1, 1)).days * 4
+        grid = np.lib.format.open_memmap(
+            fileloc, mode="w+", dtype=np.float32, shape=(n_hours, *GRID_SHAPE)
+        )
+        grid[:] = np.nan
+        return grid
+
+    return np.load(fileloc, mmap_mode=mode)
+
+
+def convert_text_grids(year: int):
+    """Converts the text files of a year written by older versions of fetch_grb into binary weather grids.
+
+    Args:
+        year (int): year to convert
+    """
+    for variable in WEATHER_VARIABLES:
+        listOfFiles = glob(
+            f"{WEATHER_FOLDER}/{variable}/{year}/{variable}_{year}_*_*_*.npy"
+        )
+        if not listOfFiles:
+            continue
+
+        grid = open_grid(variable, year, mode="r+")
+        for fileloc in tqdm(listOfFiles):
+            month, day, hour = os.path.basename(fileloc)[:-4].split("_")[-3:]
+            grid[grid_index(year, int(month), int(day), int(hour))] = np.loadtxt(
+                fileloc
+            )
+        grid.flush()
+
+
+def grb_downloaded(year: int, month: int, day: int, hour: int):
+    """Checks if the weather data of a synoptic hour is already in the weather grids.
+
+    Args:
+        year (int): year
+        month (int): month
+        day (int): day
+        hour (int): hour (only 0, 6, 12 and 18)
+
+    Returns:
+        bool: True if the data is already there
+    """
+    # cape is the last variable written by decode_grb
+    return (
+        os.path.exists(grid_file("cape", year))
+        and not np.isnan(
+            open_grid("cape", year)[grid_index(year, month, day, hour)]
+        ).all()
+    )
+
+
+def download_grb(remote_url: str, fpath: str, session: requests.Session = None):
+    """Downloads a grib file. The download goes to a .part file first, so an interrupted download is resumed the next time.
+    The part file only becomes the grib file when its size matches the size the server reported.
+
+    Args:
+        remote_url (str): url of the grib file
+        fpath (str): location to save the grib file
+        session (requests.Session, optional): session to reuse the connection of. Defaults to None.
+
+    Returns:
+        bool: True if the file has been downloaded, False if it is not on the server or is incomplete
+    """
+    if os.path.exists(fpath):
+        return True
+
+    if session is None:
+        session = requests.Session()
+
+    part_path = fpath + ".part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": "bytes=%d-" % offset} if offset else {}
+
+    with session.get(remote_url, stream=True, headers=headers, timeout=60) as response:
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code == 416:
+            # The requested range starts at the end of the file, so it was already complete.
+            # That is only known when the server reports the size of the file ("bytes */total"),
+            # otherwise, or when the part file is larger than the remote file, it is started again
+            if content_range.split("/")[-1] != str(offset):
+                os.remove(part_path)
+                return False
+            os.replace(part_path, fpath)
+            return True
+        if response.status_code not in [200, 206]:
+            # print("Error. remote data not found")
+            return False
+
+        if response.status_code == 206:
+            # "bytes start-end/total", the part has to continue where the file ends
+            start = content_range.split(" ")[-1].split("-")[0]
+            if start == "0":
+                # the range starts at the beginning of the file, so the part is written again
+                offset = 0
+            elif start != str(offset):
+                # the part can not be continued, the next download starts from the beginning
+                os.remove(part_path)
+                return False
+            total = content_range.split("/")[-1]
+        else:
+            # 200 means the server ignored the range and sends the whole file again
+            offset = 0
+            total = response.headers.get("Content-Length", "*")
+        if response.headers.get("Content-Encoding", "identity") != "identity":
+            # The size of the decoded content is not known
+            total = "*"
+
+        with open(part_path, "ab" if offset else "wb") as f:
+            for data in response.iter_content(chunk_size=1024 * 1024):
+                f.write(data)
+
+    # A stream that was closed early is kept, the next download resumes it
+    if total != "*" and os.path.getsize(part_path) != int(total):
+        return False
+
+    os.replace(part_path, fpath)
+    return True
+
+
+def decode_grb(fpath: str, year, month, day, hour, plot_data: bool = False):
+    """Crops the variables of a downloaded grib file to europe, writes them to the weather grids and removes the grib file.
+
+    Args:
+        fpath (str): location of the grib file
+        year (int): year of the data
+        month (int): month of the data
+        day (int): day of the data
+        hour (int): hour of the data (only 0, 6, 12 and 18)
+        plot_data (bool, optional): Plots each variable. Defaults to False.
+    """
+    # indexpath="" keeps cfgrib from writing an index file next to the grib file
+    ds = xr.open_dataset(
+        fpath,
+        engine="cfgrib",
+        backend_kwargs={"filter_by_keys": {"typeOfLevel": "surface"}, "indexpath": ""},
+        decode_coords=True,
+    )
+    # the grid is regular, so the european window is a latitude slice and two
+    # longitude slices (west of greenwich at the end of the axis, east at the start)
+    latitudes = ds.latitude.values
+    longitudes = ds.longitude.values
+    lat_index = np.flatnonzero((latitudes > 30) & (latitudes < 70))
+    west_index = np.flatnonzero(longitudes > 350)
+    east_index = np.flatnonzero(longitudes < 60)
+    lat_slice = slice(lat_index[0], lat_index[-1] + 1)
+    west_slice = slice(west_index[0], west_index[-1] + 1)
+    east_slice = slice(east_index[0], east_index[-1] + 1)
+
+    # variables are decoded lazily, so only the used ones are read from the file
+    for weather_type in WEATHER_VARIABLES:
+        variable = ds[weather_type].isel(latitude=lat_slice)
+        weather_data_numpy = np.hstack(
+            [
+                variable.isel(longitude=west_slice).values,
+                variable.isel(longitude=east_slice).values,
+            ]
+        )
+
+        grid = open_grid(weather_type, year, mode="r+")
+        grid[grid_index(year, month, day, hour)] = weather_data_numpy
+        grid.flush()
+
+        if plot_data:
+            plt.imshow(weather_data_numpy, cmap="hot", interpolation="nearest")
+            plt.show()
+    ds.close()
+
+    os.remove(fpath)
+
+
+def grb_location(year, month, day, hour, pred=0, url: str = GFS_URL):
+    """Remote url and local file location of a GFS grib file
+
+    Args:
+        year (int): year of the data
+        month (int): month of the data
+        day (int): day of the data
+        hour (int): hour of the data (only 0, 6, 12 and 18)
+        pred (int, optional): Fixed end of url. Defaults to 0.
+        url (str, optional): base url of the GFS analysis data. Defaults to GFS_URL.
+
+    Returns:
+        tuple: remote url and local file location
+    """
+    ym = "%04d%02d" % (year, month)
+    ymd = "%04d%02d%02d" % (year, month, day)
+    hm = "%02d00" % hour
+    pred = "%03d" % pred
+
+    fname = "gfsanl_3_%s_%s_%s.grb2" % (ymd, hm, pred)
+    remote_loc = "/%s/%s/%s" % (ym, ymd, fname)
+
+    return url + remote_loc, GRIB_FOLDER + fname
+
+
+def fetch_grb(
+    year, month, day, hour, pred=0, plot_data: bool = False, url: str = GFS_URL
+):
     """grabs weather data from internet and turns it into numpy arrays for each variable and saves them in corresponding folder.
 
     Args:
@@ -72,88 +343,130 @@ def fetch_grb(year, month, day, hour, pred=0, plot_data: bool = False):
         hour (int): hour to grab data from (only data at 0, 6, 12 and 18)
         pred (int, optional): Fixed end of url. Only change from 0 if grabbing from different dataset. Defaults to 0.
         plot_data (bool, optional): Plots each variable after downloading data. Defaults to False.
+        url (str, optional): base url of the GFS analysis data. Defaults to GFS_URL.
 
     Returns:
         [type]: [description]
     """
-    datadir = "./data/grib/"
-    if not os.path.exists(datadir):
-        os.mkdir(os.path.join(datadir))
+    os.makedirs(GRIB_FOLDER, exist_ok=True)
 
-    windgfs_url = "https://www.ncei.noaa.gov/data/global-forecast-system/access/historical/analysis/"
-    ym = "%04d%02d" % (year, month)
-    ymd = "%04d%02d%02d" % (year, month, day)
-    hm = "%02d00" % hour
-    pred = "%03d" % pred
+    if not grb_downloaded(year, month, day, hour):
+        remote_url, fpath = grb_location(year, month, day, hour, pred, url)
+        if not download_grb(remote_url, fpath):
+            return None
 
-    fname = "gfsanl_3_%s_%s_%s.grb2" % (ymd, hm, pred)
-    fpath = datadir + fname
+        decode_grb(fpath, year, month, day, hour, plot_data)
+    # else:
+    # print('File already exists!')
 
-    if not os.path.exists(
-        f"./data/Weather_Data_Filtered/cape/{year}/cape_{year}_{month}_{day}_{hour}.npy"
-    ):
-        remote_loc = "/%s/%s/gfsanl_3_%s_%s_%s.grb2" % (ym, ymd, ymd, hm, pred)
-        remote_url = windgfs_url + remote_loc
-        # print("\n Downloading %s" % remote_url)
-        response = requests.get(remote_url, stream=True)
-        if response.status_code != 200:
-            # print("Error. remote data not found")
-            return None
-        # else:
-        #     print('Download succesfull!')
 
-        with open(fpath, "wb") as f:
-            # print('Writing to grib...')
-            total_length = response.headers.get("content-length")
+def fetch_grb_bulk(dates: list, pred=0, workers: int = 4, url: str = GFS_URL):
+    """Grabs the weather data of many synoptic hours. Files are downloaded concurrently by a pool of threads,\
+        each keeping its connection open, while the main thread decodes the files that are finished.\
+        Interrupted downloads are resumed and hours that are already in the weather grids are skipped.
 
-            if total_length is None:  # no content length header
-                f.write(response.content)
-            else:
-                dl = 0
-                total_length = int(total_length)
-                for data in response.iter_content(chunk_size=4096):
-                    dl += len(data)
-                    f.write(data)
-                    done = int(100 * dl / total_length)
-                    # sys.stdout.write("\r[%s%s]" % ('=' * done, ' ' * (100-done)) )
-                    # sys.stdout.flush()
+    Args:
+        dates (list): list of datetimes to grab data for (only hours 0, 6, 12 and 18)
+        pred (int, optional): Fixed end of url. Defaults to 0.
+        workers (int, optional): number of concurrent downloads. Defaults to 4.
+        url (str, optional): base url of the GFS analysis data. Defaults to GFS_URL.
 
-        ds = xr.open_dataset(
-            fpath,
-            engine="cfgrib",
-            backend_kwargs={"filter_by_keys": {"typeOfLevel": "surface"}},
-            decode_coords=True,
-        )
-        ds2 = ds.where(
-            (ds.longitude < 60) & (ds.latitude > 30) & (ds.latitude < 70), drop=True
-        )
-        ds3 = ds.where(
-            (ds.longitude > 350) & (ds.latitude > 30) & (ds.latitude < 70), drop=True
+    Returns:
+        list: datetimes for which no data could be downloaded, also when the download failed or was incomplete
+    """
+    os.makedirs(GRIB_FOLDER, exist_ok=True)
+
+    dates = [
+        date
+        for date in dates
+        if not grb_downloaded(date.year, date.month, date.day, date.hour)
+    ]
+
+    sessions = threading.local()
+
+    def download(date):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        remote_url, fpath = grb_location(
+            date.year, date.month, date.day, date.hour, pred, url
         )
+        return download_grb(remote_url, fpath, sessions.session), fpath
+
+    missing = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(download, date): date for date in dates}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            date = futures[future]
+            try:
+                downloaded, fpath = future.result()
+            except requests.RequestException:
+                # A failed download is retried by the next call, the other files are still decoded
+                downloaded = False
+            if downloaded:
+                decode_grb(fpath, date.year, date.month, date.day, date.hour)
+            else:
+                missing.append(date)
 
-        for weather_type in ["vis", "gust", "t", "cpofp", "lftx", "cape"]:
-            weather_data_numpy = np.hstack(
-                [ds3.variables[weather_type].data, ds2.variables[weather_type].data]
-            )
+    return sorted(missing)
 
-            if not os.path.exists(f"./data/Weather_Data_Filtered/{weather_type}/"):
-                os.makedirs(f"./data/Weather_Data_Filtered/{weather_type}/")
-            if not os.path.exists(
-                f"./data/Weather_Data_Filtered/{weather_type}/{year}/"
-            ):
-                os.makedirs(f"./data/Weather_Data_Filtered/{weather_type}/{year}/")
-            np.savetxt(
-                f"./data/Weather_Data_Filtered/{weather_type}/{year}/{weather_type}_{year}_{month}_{day}_{hour}.npy",
-                weather_data_numpy,
-                fmt="%d",
-            )
-            if plot_data:
-                plt.imshow(weather_data_numpy, cmap="hot", interpolation="nearest")
-                plt.show()
-        os.remove(fpath)
-        os.remove(fpath + ".923a8.idx")
-    # else:
-    # print('File already exists!')
+
+def weather_file(airport: str, year: int, interval: int, extension: str = "parquet"):
+    """Location of the weather data of an airport
+
+    Args:
+        airport (str): airport code (FE: 'EBBR').
+        year (int): year of the data
+        interval (int): minute intervals of the data points
+        extension (str, optional): file type, "parquet" or "csv" (older versions). Defaults to "parquet".
+
+    Returns:
+        str: file location
+    """
+    return f"{WEATHER_FOLDER}/Airports/{interval}_interval/{year}/{airport}_{year}_{interval}.{extension}"
+
+
+def weather_artifact(airport: str, year: int, interval: int):
+    """Parameters and upstream grids of the weather data of an airport, as recorded in the cache manifest
+
+    Args:
+        airport (str): airport code (FE: 'EBBR').
+        year (int): year of the data
+        interval (int): minute intervals of the data points
+
+    Returns:
+        tuple: parameters and locations of the weather grids of the year
+    """
+    params = {
+        "airport": airport,
+        "year": year,
+        "interval": interval,
+        "variables": WEATHER_VARIABLES,
+    }
+    grids = [
+        grid_file(variable, year)
+        for variable in WEATHER_VARIABLES
+        if os.path.exists(grid_file(variable, year))
+    ]
+    return params, grids
+
+
+def convert_weather_csv(airport: str, year: int, interval: int):
+    """Converts a weather csv written by older versions of npy_to_df to parquet, so the text is only parsed once.
+
+    Args:
+        airport (str): airport code (FE: 'EBBR').
+        year (int): year of the data
+        interval (int): minute intervals of the data points
+    """
+    df = pd.read_csv(weather_file(airport, year, interval, "csv"), header=0)
+    df["time"] = pd.to_datetime(df.time, format="%Y-%m-%d %H:%M:%S")
+    df.to_parquet(weather_file(airport, year, interval), index=False)
+
+
+def clear_weather_cache():
+    """Empties the in memory cache of fetch_weather_data"""
+    with _weather_cache_lock:
+        _weather_cache.clear()
 
 
 def npy_to_df(year: int, interval: int):
@@ -169,16 +482,18 @@ def npy_to_df(year: int, interval: int):
     if 60 % interval != 0:
         raise ValueError("Interval should always contain each full hour")
 
-    if not os.path.exists(
-        f"./data/Weather_Data_Filtered/gust/{year}/gust_{year}_3_1_0.npy"
-    ):
+    if not os.path.exists(grid_file("gust", year)):
+        # Text files written by older versions of fetch_grb are converted once
+        convert_text_grids(year)
+
+    if not os.path.exists(grid_file("gust", year)):
         if year == 2018 or year == 2019:
             raise FileNotFoundError(
                 f"COULD NOT FIND {year} DATA! Make sure you have the 2019 and 2018 data downloaded correctly"
             )
         else:
             raise FileNotFoundError(
-                f"COULD NOT FIND {year} DATA! If you want data for a year other than 2019 and 2018, run fetch_grb() in a for loop (see weather.py __main__). Warning: this function takes ~hour to run"
+                f"COULD NOT FIND {year} DATA! If you want data for a year other than 2019 and 2018, run fetch_grb_bulk() (see weather.py __main__). Warning: this can take a while to run"
             )
 
     if not os.path.exists(
@@ -188,60 +503,57 @@ def npy_to_df(year: int, interval: int):
             f"./data/Weather_Data_Filtered/Airports/{interval}_interval/{year}/"
         )
 
-    minute_list = []
-    overloaded = False
-    minute = 0
-    while not overloaded:
-        minute_list.append(minute)
-        minute += interval
-        if minute >= 60:
-            overloaded = True
-
-    for airport in tqdm(airport_dict):
-        long = int(airport_dict[airport]["longitude"])
-        lat = int(airport_dict[airport]["latitude"])
-        airport_data = {
-            "time": [],
-            "vis": [],
-            "gust": [],
-            "t": [],
-            "cpofp": [],
-            "lftx": [],
-            "cape": [],
-        }
-        for month in [3, 6, 9, 12]:
-            for day in range(1, 31):
-                for hour in range(0, 24):
-                    for minute in minute_list:
-                        airport_data["time"].append(
-                            datetime(year, month, day, hour, minute)
-                        )
-                        for variable in ["vis", "gust", "t", "cpofp", "lftx", "cape"]:
-                            if hour in [0, 6, 12, 18] and minute == 0:
-                                try:
-                                    weather_array = np.loadtxt(
-                                        f"./data/Weather_Data_Filtered/{variable}/{year}/{variable}_{year}_{month}_{day}_{hour}.npy"
-                                    )
-                                    airport_data[variable].append(
-                                        weather_array[69 - lat, long + 9]
-                                    )
-                                except OSError:
-                                    airport_data[variable].append(np.NaN)
-                            else:
-                                airport_data[variable].append(np.NaN)
-        df = pd.DataFrame(airport_data)
-        for variable in ["vis", "gust", "t", "cpofp", "lftx", "cape"]:
-            df[[variable]] = df[[variable]].interpolate()
-
-        pd.DataFrame((df)).to_csv(
-            f"./data/Weather_Data_Filtered/Airports/{interval}_interval/{year}/{airport}_{year}_{interval}.csv",
-            header=True,
-            index=False,
+    times = pd.DatetimeIndex(
+        np.concatenate(
+            [
+                pd.date_range(
+                    datetime(year, month, 1),
+                    datetime(year, month, 30, 23, 59),
+                    freq=f"{interval}min",
+                )
+                for month in [3, 6, 9, 12]
+            ]
         )
+    )
+
+    # Only the synoptic hours have data, the other rows are interpolated
+    synoptic_rows = np.flatnonzero((times.hour % 6 == 0) & (times.minute == 0))
+    synoptic_hours = (times[synoptic_rows].dayofyear - 1) * 4 + times[
+        synoptic_rows
+    ].hour // 6
+
+    # Grid cell of every airport
+    airports = list(airport_dict)
+    lat_index = [69 - int(airport_dict[airport]["latitude"]) for airport in airports]
+    long_index = [int(airport_dict[airport]["longitude"]) + 9 for airport in airports]
+
+    # time x airport array for each variable, every grid is read only once
+    weather_data = {}
+    for variable in WEATHER_VARIABLES:
+        values = np.full((len(times), len(airports)), np.nan)
+        if os.path.exists(grid_file(variable, year)):
+            grid = open_grid(variable, year)
+            values[synoptic_rows] = grid[synoptic_hours][:, lat_index, long_index]
+        weather_data[variable] = pd.DataFrame(values).interpolate().to_numpy()
+
+    for airport_index, airport in enumerate(tqdm(airports)):
+        df = pd.DataFrame({"time": times})
+        for variable in WEATHER_VARIABLES:
+            df[variable] = weather_data[variable][:, airport_index]
+
+        df.to_parquet(weather_file(airport, year, interval), index=False)
+        recordArtifact(
+            weather_file(airport, year, interval),
+            *weather_artifact(airport, year, interval),
+        )
+
+    # Frames read before the files were regenerated are outdated
+    clear_weather_cache()
 
 
 def fetch_weather_data(airport: str, interval: int, years: list = [2019, 2018]):
     """reads a weather data file, and if it does not exist, it will generate it and read it afterwards.
+    Read frames are kept in memory (up to WEATHER_CACHE_BYTES), so repeated calls do not read the files again.
 
     Args:
         airport (str): airport code (FE: 'EBBR').
@@ -262,8 +574,6 @@ def fetch_weather_data(airport: str, interval: int, years: list = [2019, 2018]):
 
     """
 
-    dform = "%Y-%m-%d %H:%M:%S"
-
     if airport not in airport_dict:
         raise ValueError("INCORRECT AIRPORT REQUEST")
     if 0 >= interval >= 61:
@@ -271,30 +581,35 @@ def fetch_weather_data(airport: str, interval: int, years: list = [2019, 2018]):
     if 60 % interval != 0:
         raise ValueError("Interval should always contain each full hour")
 
+    key = (airport, interval, tuple(years))
+    with _weather_cache_lock:
+        if key in _weather_cache:
+            _weather_cache.move_to_end(key)
+            return _weather_cache[key].copy()
+
     for year in years:
-        if not os.path.exists(
-            f"./data/Weather_Data_Filtered/Airports/{interval}_interval/{year}/{airport}_{year}_{interval}.csv"
+        fileloc = weather_file(airport, year, interval)
+        params, grids = weather_artifact(airport, year, interval)
+        if not os.path.exists(fileloc) and os.path.exists(
+            weather_file(airport, year, interval, "csv")
         ):
+            convert_weather_csv(airport, year, interval)
+        if os.path.exists(fileloc) and artifactEntry(fileloc) is None:
+            # Files written before the cache manifest existed are taken to match the current grids
+            recordArtifact(fileloc, params, grids)
+
+        if not isFresh(fileloc, params, grids):
             print(f"generating {year} weather data for {interval} minute interval")
             npy_to_df(year, interval)
 
-    listOfFiles = []  # list with location of airport files of all years
-    for year in years:
-        listOfFiles.extend(
-            glob(
-                f"./data/Weather_Data_Filtered/Airports/{interval}_interval/{year}/{airport}_*_{interval}.csv"
-            )
-        )
-    final_df = pd.DataFrame()
-    for fileloc in listOfFiles:
-        df = pd.read_csv(fileloc, header=0)
-        final_df = final_df.append(df, ignore_index=True)
-
     final_df = (
-        final_df.assign(timeslot=lambda x: pd.to_datetime(x.time, format=dform))
-        .drop("time", axis=1)
+        pd.concat(
+            [pd.read_parquet(weather_file(airport, year, interval)) for year in years],
+            ignore_index=True,
+        )
         .rename(
             columns={
+                "time": "timeslot",
                 "vis": "visibility",
                 "gust": "windspeed",
                 "t": "temperature",
@@ -306,8 +621,25 @@ def fetch_weather_data(airport: str, interval: int, years: list = [2019, 2018]):
         .set_index("timeslot")
     )
 
-    return final_df
+    # Least recently used frames are evicted until the new frame fits
+    with _weather_cache_lock:
+        _weather_cache[key] = final_df
+        size = sum(df.memory_usage(index=True).sum() for df in _weather_cache.values())
+        while size > WEATHER_CACHE_BYTES and len(_weather_cache) > 1:
+            _, evicted = _weather_cache.popitem(last=False)
+            size -= evicted.memory_usage(index=True).sum()
+
+    return final_df.copy()
 
 
 if __name__ == "__main__":
-    pass
+    # Backfill the weather data of a year
+    year = 2017
+    fetch_grb_bulk(
+        [
+            datetime(year, month, day, hour)
+            for month in [3, 6, 9, 12]
+            for day in range(1, 31)
+            for hour in [0, 6, 12, 18]
+        ]
+    )
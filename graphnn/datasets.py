@@ -5,7 +5,10 @@ import matplotlib.pyplot as plt
 import scipy.sparse as sp
 import tensorflow as tf
 import networkx as nx
-from datetime import datetime
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
 import sys
 
 sys.path.append(".")
@@ -13,14 +16,34 @@ from spektral.data import Dataset, DisjointLoader, Graph
 
 from extraction.extractadjacency import distance_weight_adjacency
 
-from extraction.extract import generateNNdataMultiple
-from extraction.extractadjacency import getAdjacencyMatrix
+from extraction.extract import (
+    generateNNdataMultiple,
+    generalFilterAirports,
+    timeslotCalendar,
+    nnDataArtifact,
+    flightStoreManifestFile,
+)
+from extraction.cachemanifest import isFresh, recordArtifact
+from extraction.extractadjacency import (
+    getAdjacencyMatrix,
+    adjacencyCounts,
+    adjacencyFromCounts,
+    adjacencyMaximum,
+)
 from extraction.airportvalues import airport_dict
 
+# arrays of the flight counts in the dataset cache, see adjacencyCounts
+COUNT_ARRAYS = ["slot", "ades", "adep", "counts"]
+
 
 class FlightNetworkDataset(Dataset):
     WEIGHT = 0.4
     THRESHOLD = 1000
+    # built tensors are stored in CACHE_FOLDER, increase VERSION when their format changes
+    CACHE_FOLDER = "graphData"
+    VERSION = 2
+    # folder of the flight store the node data and flight counts are generated from
+    FILTERED_FOLDER = "filteredData"
 
     def __init__(
         self,
@@ -28,6 +51,9 @@ class FlightNetworkDataset(Dataset):
         timeslotLength: int,
         start: datetime = datetime(2019, 3, 1),
         end: datetime = datetime(2019, 3, 31),
+        sparse: bool = False,
+        cache: bool = True,
+        forceRegenerateData: bool = False,
         **kwargs
     ):
         """The essential dataset generator for aggregated network flight data in Spektral Graph format
@@ -38,12 +64,20 @@ class FlightNetworkDataset(Dataset):
             timeslotLength (int): length of timeslot to aggregate by
             start (datetime, optional): start time to generate graphs for (Inclusive). Defaults to datetime(2019, 3, 1).
             end (datetime, optional): end time to generate graphs for (Inclusive). Defaults to datetime(2019, 3, 31).
+            sparse (bool, optional): store the adjacency of each graph as a scipy sparse matrix, so memory scales
+            with the amount of active routes. Use with a DisjointLoader. Defaults to False.
+            cache (bool, optional): store the built node features and flight counts in CACHE_FOLDER and reuse them,
+            a later end only generates the new timeslots. Defaults to True.
+            forceRegenerateData (bool, optional): rebuild the cache from scratch. Defaults to False.
         """
         self.timeslotLength = timeslotLength
         self.airports = airports
         self.n_airports = len(airports)
         self.start = start
         self.end = end
+        self.sparse = sparse
+        self.cache = cache
+        self.forceRegenerateData = forceRegenerateData
 
         timespan = end - start
         self._maxIndex = (
@@ -58,46 +92,201 @@ class FlightNetworkDataset(Dataset):
         Returns:
             list: returns a list of graphs
         """
-        dataDict = generateNNdataMultiple(
+        if self.cache:
+            X, Y, self._times, counts = self._readCache()
+            flight_adjacency = adjacencyFromCounts(
+                *counts,
+                nTimeslots=len(
+                    timeslotCalendar(self.start, self.end, self.timeslotLength)
+                ),
+                nAirports=self.n_airports,
+                sparse=self.sparse,
+            )
+        else:
+            X, Y, self._times = self._nodeData(self.start, self.end)
+            flight_adjacency = getAdjacencyMatrix(
+                self.airports,
+                self.start,
+                self.end,
+                timeslotLength=self.timeslotLength,
+                sparse=self.sparse,
+            )
+        distance_adjacency = distance_weight_adjacency(
+            self.airports, threshold=self.THRESHOLD
+        )
+        if self.sparse:
+            # one sparse matrix per timeslot, the distance part is shared
+            distance_adjacency = sp.csr_matrix(self.WEIGHT * distance_adjacency)
+            adjacencies = [
+                distance_adjacency + (1 - self.WEIGHT) * flights
+                for flights in flight_adjacency
+            ]
+        else:
+            adjacencies = (
+                self.WEIGHT * distance_adjacency + (1 - self.WEIGHT) * flight_adjacency
+            )
+
+        # every graph holds views into the stacked arrays
+        final = []  # list of graphs
+        for timeIndex in range(self._maxIndex + 1):
+            final.append(
+                Graph(x=X[timeIndex], a=adjacencies[timeIndex], y=Y[timeIndex])
+            )
+
+        return final
+
+    def _nodeData(self, start: datetime, end: datetime) -> tuple:
+        """Node features and labels of all airports between start and end
+
+        Args:
+            start (datetime): start time (Inclusive)
+            end (datetime): end time (Exclusive)
+
+        Returns:
+            tuple: timeslots x airports x features array, timeslots x airports x labels array and times dataframe
+        """
+        # timeslots x airports x features and timeslots x airports x labels
+        X, Y, T = generateNNdataMultiple(
             self.airports,
             self.timeslotLength,
             GNNFormat=True,
-            start=self.start,
-            end=self.end,
+            start=start,
+            end=end,
+            stacked=True,
+            filteredFolder=self.FILTERED_FOLDER,
         )
+        return np.asarray(X, dtype=np.float64), np.asarray(Y, dtype=np.float64), T
 
-        # store times for accountability later
-        self._times = (list(dataDict.values())[0]["T"])
+    def _flightCounts(self, start: datetime, end: datetime, offset: int = 0) -> tuple:
+        """Flight counts between the airports for the timeslots between start and end, see adjacencyCounts
+
+        Args:
+            start (datetime): start time (Inclusive)
+            end (datetime): end time (Exclusive)
+            offset (int, optional): timeslot id of start. Defaults to 0.
 
-        flight_adjacency = getAdjacencyMatrix(
-            self.airports, self.start, self.end, timeslotLength=self.timeslotLength
+        Returns:
+            tuple: timeslot, ADES and ADEP ids and flight count of every nonzero entry
+        """
+        dateList = timeslotCalendar(start, end, self.timeslotLength)
+        # flights are counted by arrival, so include flights that departed the day before start
+        P = generalFilterAirports(
+            max(self.start, start - timedelta(days=1)),
+            end,
+            self.airports,
+            betweenAirports=True,
+            saveFolder=self.FILTERED_FOLDER,
         )
-        distance_adjacency = distance_weight_adjacency(
-            self.airports, threshold=self.THRESHOLD
+        slot, ades, adep, counts = adjacencyCounts(
+            P, self.airports, dateList, self.timeslotLength
         )
-        adjacencies = (
-            self.WEIGHT * distance_adjacency + (1 - self.WEIGHT) * flight_adjacency
+        return slot + offset, ades, adep, counts
+
+    def _cacheFolder(self) -> str:
+        """Folder of the cache, one per version, airports, timeslot length and start"""
+        key = json.dumps(
+            [
+                self.VERSION,
+                list(self.airports),
+                self.timeslotLength,
+                self.start.isoformat(),
+            ]
         )
+        return f"{self.CACHE_FOLDER}/{hashlib.sha1(key.encode()).hexdigest()[:16]}"
 
-        n_features = (list(dataDict.values())[0]["X"]).shape[1]
-        n_labels = len(list(dataDict.values())[0]["Y"].columns)  # 2
+    def _readCache(self) -> tuple:
+        """Reads the node data and flight counts from the cache, generates what is missing first.
+        Node features, labels and flight counts are memory mapped.
 
-        def makeGraph(timeIndex):
-            X = np.zeros((self.n_airports, n_features))
-            Y = np.zeros((self.n_airports, n_labels))
-            A = adjacencies[timeIndex]
+        Returns:
+            tuple: features, labels, times dataframe and flight counts between start and end
+        """
+        folder = self._cacheFolder()
+        metaFile = f"{folder}/meta.json"
 
-            for AirportIndex, airport in enumerate(self.airports):
-                X[AirportIndex] = dataDict[airport]["X"].iloc[timeIndex, :].to_numpy()
-                Y[AirportIndex] = dataDict[airport]["Y"].iloc[timeIndex, :].to_numpy()
+        def save(name, array):
+            np.save(f"{folder}/{name}.tmp.npy", array)
+            os.replace(f"{folder}/{name}.tmp.npy", f"{folder}/{name}.npy")
 
-            return Graph(x=X, a=A, y=Y)
+        # the cache is outdated when the NN data or the flights it was built from changed
+        params = {
+            "version": self.VERSION,
+            "airports": list(self.airports),
+            "timeslotLength": self.timeslotLength,
+            "start": self.start.isoformat(),
+        }
+        upstream = [
+            nnDataArtifact(
+                airport, self.timeslotLength, filteredFolder=self.FILTERED_FOLDER
+            )[0]
+            for airport in self.airports
+        ] + [flightStoreManifestFile(self.FILTERED_FOLDER)]
 
-        final = []  # list of graphs
-        for timeIndex in range(self._maxIndex + 1):
-            final.append(makeGraph(timeIndex))
+        cachedEnd = None
+        if (
+            os.path.exists(metaFile)
+            and not self.forceRegenerateData
+            and isFresh(metaFile, params, upstream)
+        ):
+            with open(metaFile) as f:
+                cachedEnd = datetime.fromisoformat(json.load(f)["end"])
+            # the cache can only be extended from a timeslot boundary
+            if (cachedEnd - self.start) % timedelta(minutes=self.timeslotLength):
+                cachedEnd = None
 
-        return final
+        if cachedEnd is None:
+            print(f"Generating graph data cache in {folder}")
+            os.makedirs(folder, exist_ok=True)
+            X, Y, T = self._nodeData(self.start, self.end)
+            counts = self._flightCounts(self.start, self.end)
+        elif cachedEnd < self.end:
+            # only the timeslots after the cached end are generated
+            print(f"Extending graph data cache in {folder} from {cachedEnd}")
+            X, Y, T = self._nodeData(cachedEnd, self.end)
+            X = np.concatenate([np.load(f"{folder}/X.npy", mmap_mode="r"), X])
+            Y = np.concatenate([np.load(f"{folder}/Y.npy", mmap_mode="r"), Y])
+            T = pd.DataFrame(
+                {
+                    "timeslot": np.concatenate(
+                        [np.load(f"{folder}/times.npy"), T.timeslot.to_numpy()]
+                    )
+                }
+            )
+            offset = len(timeslotCalendar(self.start, cachedEnd, self.timeslotLength))
+            counts = tuple(
+                np.concatenate([np.load(f"{folder}/{name}.npy", mmap_mode="r"), new])
+                for name, new in zip(
+                    COUNT_ARRAYS, self._flightCounts(cachedEnd, self.end, offset)
+                )
+            )
+
+        if cachedEnd is None or cachedEnd < self.end:
+            # without the meta file the arrays are never extended twice when this run is interrupted
+            if os.path.exists(metaFile):
+                os.remove(metaFile)
+            save("X", X)
+            save("Y", Y)
+            save("times", T.timeslot.to_numpy())
+            for name, array in zip(COUNT_ARRAYS, counts):
+                save(name, array)
+            # the meta file is written last, so an interrupted build or extension is regenerated
+            with open(metaFile, "w") as f:
+                json.dump({**params, "end": self.end.isoformat()}, f)
+            recordArtifact(metaFile, params, upstream, outputs=[folder])
+
+        # the cache may reach further than end
+        times = np.load(f"{folder}/times.npy")
+        nTimes = np.searchsorted(times, np.datetime64(self.end))
+        X = np.load(f"{folder}/X.npy", mmap_mode="r")[:nTimes]
+        Y = np.load(f"{folder}/Y.npy", mmap_mode="r")[:nTimes]
+        nTimeslots = len(timeslotCalendar(self.start, self.end, self.timeslotLength))
+        counts = [
+            np.load(f"{folder}/{name}.npy", mmap_mode="r") for name in COUNT_ARRAYS
+        ]
+        nCounts = np.searchsorted(counts[0], nTimeslots)
+        counts = tuple(array[:nCounts] for array in counts)
+
+        return X, Y, pd.DataFrame({"timeslot": times[:nTimes]}), counts
 
     def visualiseGraph(self, nthGraph=0):
         """visualise a quick representation of a graph without a map
@@ -106,7 +295,7 @@ class FlightNetworkDataset(Dataset):
             nthGraph (int, optional): the index of the graph to display. Defaults to 0.
         """
         graph = self[nthGraph]
-        adj = graph.a
+        adj = graph.a.toarray() if sp.issparse(graph.a) else graph.a
         G = nx.convert_matrix.from_numpy_array(adj)
         labels = {}
         pos = {}
@@ -127,3 +316,128 @@ class FlightNetworkDataset(Dataset):
         nx.draw_networkx_labels(G, pos, labels=node_labels)
         print(f"Plotted time is: {self._times.iloc[nthGraph].values}")
         plt.show()
+
+
+class GraphSequence:
+    def __init__(self, X: np.ndarray, Y: np.ndarray, adjacency, timeIndex: np.ndarray):
+        """List of graphs that are only made when they are accessed, used as the graphs of LazyFlightNetworkDataset.
+        Assigning graphs (as the spektral loaders do to shuffle) reorders the timeslots.
+
+        Args:
+            X (np.ndarray): timeslots x airports x features array, can be memory mapped
+            Y (np.ndarray): timeslots x airports x labels array, can be memory mapped
+            adjacency (callable): returns the adjacency matrix of a timeslot
+            timeIndex (np.ndarray): timeslot of each graph
+        """
+        self.X = X
+        self.Y = Y
+        self.adjacency = adjacency
+        self.timeIndex = np.array(timeIndex)
+
+    def __len__(self) -> int:
+        return len(self.timeIndex)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return GraphSequence(self.X, self.Y, self.adjacency, self.timeIndex[key])
+
+        timeIndex = self.timeIndex[key]
+        return Graph(
+            x=np.asarray(self.X[timeIndex]),
+            a=self.adjacency(timeIndex),
+            y=np.asarray(self.Y[timeIndex]),
+            # keys starting with __ are not seen by spektral
+            **{"__timeIndex": timeIndex},
+        )
+
+    def __setitem__(self, key, value):
+        # only the timeslot of an assigned graph is kept
+        graphs = value if isinstance(value, (list, tuple)) else [value]
+        if any(graph["__timeIndex"] is None for graph in graphs):
+            raise ValueError("Only graphs made by a GraphSequence can be assigned")
+        if isinstance(value, (list, tuple)):
+            self.timeIndex[key] = [graph["__timeIndex"] for graph in graphs]
+        else:
+            self.timeIndex[key] = value["__timeIndex"]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class LazyFlightNetworkDataset(FlightNetworkDataset):
+    def __init__(
+        self,
+        airports: list,
+        timeslotLength: int,
+        start: datetime = datetime(2019, 3, 1),
+        end: datetime = datetime(2019, 3, 31),
+        sparse: bool = False,
+        forceRegenerateData: bool = False,
+        **kwargs
+    ):
+        """FlightNetworkDataset that makes each graph when it is accessed, from the memory mapped arrays in the cache.
+        Only the graphs of a batch are in memory, so long periods with many airports can be streamed by the spektral loaders.
+
+        Args:
+            airports (list): list of aiports to generate the dataset of
+            timeslotLength (int): length of timeslot to aggregate by
+            start (datetime, optional): start time to generate graphs for (Inclusive). Defaults to datetime(2019, 3, 1).
+            end (datetime, optional): end time to generate graphs for (Inclusive). Defaults to datetime(2019, 3, 31).
+            sparse (bool, optional): make the adjacency of each graph a scipy sparse matrix. Defaults to False.
+            forceRegenerateData (bool, optional): rebuild the cache from scratch. Defaults to False.
+        """
+        super().__init__(
+            airports,
+            timeslotLength,
+            start,
+            end,
+            sparse=sparse,
+            cache=True,
+            forceRegenerateData=forceRegenerateData,
+            **kwargs
+        )
+
+    def read(self) -> GraphSequence:
+        """Opens the cached network data, generating it first if needed
+
+        Returns:
+            GraphSequence: list of graphs that are made on access
+        """
+        X, Y, self._times, self._counts = self._readCache()
+        slot, ades, adep, counts = self._counts
+
+        nTimeslots = len(timeslotCalendar(self.start, self.end, self.timeslotLength))
+        self._bounds = np.searchsorted(slot, np.arange(nTimeslots + 1))
+        self._maximum = adjacencyMaximum(ades, adep, counts, self.n_airports)
+
+        self._distance = self.WEIGHT * distance_weight_adjacency(
+            self.airports, threshold=self.THRESHOLD
+        )
+        if self.sparse:
+            self._distance = sp.csr_matrix(self._distance)
+
+        return GraphSequence(X, Y, self._adjacency, np.arange(self._maxIndex + 1))
+
+    def _adjacency(self, timeIndex: int):
+        """Adjacency matrix of a timeslot, the same as in FlightNetworkDataset
+
+        Args:
+            timeIndex (int): timeslot of the graph
+
+        Returns:
+            np.ndarray: Nairports x Nairports array (scipy.sparse.csr_matrix if sparse)
+        """
+        a, b = self._bounds[timeIndex], self._bounds[timeIndex + 1]
+        _, ades, adep, counts = (array[a:b] for array in self._counts)
+        flights = sp.coo_matrix(
+            (counts / self._maximum[ades, adep], (ades, adep)),
+            shape=(self.n_airports, self.n_airports),
+            dtype=np.float64,
+        )
+        if self.sparse:
+            return self._distance + (1 - self.WEIGHT) * flights
+        return self._distance + (1 - self.WEIGHT) * flights.toarray()
+
+    def __iter__(self):
+        return iter(self.graphs)
@@ -6,32 +6,210 @@ import matplotlib.pyplot as plt
 import sys
 from sklearn.model_selection import train_test_split
 import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from tqdm import tqdm
 
 sys.path.append(".")
-from regressionModels.tool_box import get_preprocessed_data, plot
+from regressionModels.tool_box import (
+    get_preprocessed_data,
+    plot,
+    FlightPreprocessor,
+    read_lrdata,
+    share_data,
+    attach_data,
+    SHARED_FOLDER,
+)
+from extraction.airportvalues import airport_dict
 
 
-def grid_search_forest():
+def grid_search_forest(
+    X_train: np.array, y_train: np.array, shared_folder: str = SHARED_FOLDER
+):
     """ Performs grid search on a RandomForest estimator. DO NOT USE.
 
+    Args:
+        X_train (np.array): training data, an array or sparse matrix
+        y_train (np.array): training labels
+        shared_folder (str, optional): folder in which the training data is shared with the workers of the search, see share_data. Defaults to SHARED_FOLDER.
+
     Returns:
         dict: A dictionary containing results after GridSearch.
     """
     parameters = {
         "n_estimators": [100, 300, 600],
-        "max_features": [None, "log2", "auto"],
+        "max_features": [None, "log2", 1.0],
         "max_depth": [50, 250, 500],
         "min_samples_split": [2, 5, 10, 20, 50, 100, 1000],
         "min_samples_leaf": [1, 2, 5, 10, 20, 50, 100, 1000],
         "bootstrap": [True, False],
     }
 
+    if not sp.issparse(X_train):
+        # The forests fit on float32, so the workers do not each convert their own copy
+        X_train = np.asarray(X_train, dtype=np.float32)
+    location, shared = share_data(shared_folder, X=X_train, y=y_train)
+
     regr = RandomForestRegressor(n_jobs=-1)
 
     cv = KFold(n_splits=5, random_state=42, shuffle=True)
-    grid_search = GridSearchCV(
-        regr, parameters, cv=cv, n_jobs=-1, verbose=4, scoring="neg_mean_absolute_error"
-    ).fit(X_train, y_train)
+    try:
+        grid_search = GridSearchCV(
+            regr,
+            parameters,
+            cv=cv,
+            n_jobs=-1,
+            verbose=4,
+            scoring="neg_mean_absolute_error",
+        ).fit(shared["X"], shared["y"])
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
 
     return grid_search.cv_results_
 
+
+# Parameters of the forests trained per airport, found with grid_search_forest
+FOREST_PARAMETERS = {
+    "n_estimators": 300,
+    "max_features": 1.0,
+    "max_depth": 50,
+    "min_samples_split": 10,
+    "min_samples_leaf": 2,
+    "bootstrap": True,
+}
+
+# Flights attached to by the workers of train_airport_forests
+_flights = None
+
+
+def load_flights(filename: str = "LRData/LRDATA.parquet"):
+    """Reads LRDATA once with parsed datetimes and maps every airport to the rows of its flights
+
+    Args:
+        filename (str, optional): Filename of the LRData file, see read_lrdata. Defaults to "LRData/LRDATA.parquet".
+
+    Returns:
+        tuple: DataFrame with all flights and dict with the sorted row positions of the flights from or to each airport
+    """
+    df = read_lrdata(filename)
+    dform = "%Y-%m-%d %H:%M:%S"
+    df = df.assign(FiledOBT=lambda x: pd.to_datetime(x.FiledOBT, format=dform)).assign(
+        FiledAT=lambda x: pd.to_datetime(x.FiledAT, format=dform)
+    )
+
+    departures = df.groupby("ADEP", sort=False).indices
+    arrivals = df.groupby("ADES", sort=False).indices
+    airportRows = {
+        airport: np.union1d(
+            departures.get(airport, np.array([], dtype=np.intp)),
+            arrivals.get(airport, np.array([], dtype=np.intp)),
+        )
+        for airport in set(departures) | set(arrivals)
+    }
+
+    return df, airportRows
+
+
+def train_airport_forest(
+    P: pd.DataFrame,
+    airport: str,
+    forest_parameters: dict = FOREST_PARAMETERS,
+    sparse: bool = False,
+    n_jobs: int = -1,
+):
+    """Trains and tests a RandomForest on the flights of one airport, as in the RandomForest notebook
+
+    Args:
+        P (pd.DataFrame): flights from or to the airport in LRData format
+        airport (str): Airport codename
+        forest_parameters (dict, optional): parameters of the RandomForestRegressor. Defaults to FOREST_PARAMETERS.
+        sparse (bool, optional): train on sparse encoded features. Defaults to False.
+        n_jobs (int, optional): amount of jobs of the forest. Defaults to -1.
+
+    Returns:
+        float: mean absolute error on the test flights, nan if the airport has no flights
+    """
+    if len(P) == 0:
+        return np.nan
+
+    X, y = FlightPreprocessor(airport, sparse=sparse).fit_transform(P)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, shuffle=True, random_state=42
+    )
+    forest = RandomForestRegressor(**forest_parameters, n_jobs=n_jobs)
+    forest.fit(X_train, y_train)
+    prediction = forest.predict(X_test)
+
+    return mean_absolute_error(y_test, prediction)
+
+
+def _attach_flights(location: str):
+    global _flights
+    _flights = attach_data(location)["flights"]
+
+
+def _train_shared_airport(
+    airport: str, rows: np.ndarray, forest_parameters: dict, sparse: bool
+):
+    return train_airport_forest(
+        _flights.take(rows), airport, forest_parameters, sparse, n_jobs=1
+    )
+
+
+def train_airport_forests(
+    airports: list = list(airport_dict),
+    filename: str = "LRData/LRDATA.parquet",
+    forest_parameters: dict = FOREST_PARAMETERS,
+    sparse: bool = False,
+    workers: int = 1,
+    shared_folder: str = SHARED_FOLDER,
+):
+    """Trains a RandomForest for every airport, reading LRDATA only once
+
+    Args:
+        airports (list, optional): list of airports. Defaults to all airports in airport_dict.
+        filename (str, optional): Filename of the LRData file, see read_lrdata. Defaults to "LRData/LRDATA.parquet".
+        forest_parameters (dict, optional): parameters of the RandomForestRegressor. Defaults to FOREST_PARAMETERS.
+        sparse (bool, optional): train on sparse encoded features. Defaults to False.
+        workers (int, optional): amount of airports trained at the same time in worker processes, which attach to
+        one memory mapped copy of the flights. Each forest then uses one core. Defaults to 1.
+        shared_folder (str, optional): folder in which the flights are shared with the workers, see share_data. Defaults to SHARED_FOLDER.
+
+    Returns:
+        dict: mean absolute error of each airport
+    """
+    flights, airportRows = load_flights(filename)
+    empty = np.array([], dtype=np.intp)
+    rows = [airportRows.get(airport, empty) for airport in airports]
+
+    if workers > 1:
+        location, _ = share_data(shared_folder, flights=flights)
+        del flights
+        try:
+            with ProcessPoolExecutor(
+                workers, initializer=_attach_flights, initargs=(location,)
+            ) as executor:
+                errors = executor.map(
+                    partial(
+                        _train_shared_airport,
+                        forest_parameters=forest_parameters,
+                        sparse=sparse,
+                    ),
+                    airports,
+                    rows,
+                )
+                return dict(zip(airports, errors))
+        finally:
+            shutil.rmtree(location, ignore_errors=True)
+
+    return {
+        airport: train_airport_forest(
+            flights.take(indices), airport, forest_parameters, sparse
+        )
+        for airport, indices in tqdm(zip(airports, rows), total=len(airports))
+    }
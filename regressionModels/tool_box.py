@@ -3,41 +3,73 @@ import pandas as pd
 from seaborn.rcmod import axes_style
 from extraction.airportvalues import *
 from extraction.extractionvalues import *
-from sklearn.preprocessing import MinMaxScaler
+from extraction.extract import readLRDATA
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
 from sklearn.model_selection import KFold, GridSearchCV
 from sklearn.metrics import get_scorer
 from sklearn.svm import SVR
 from sklearn.neighbors import KNeighborsRegressor
 from sklearn.model_selection import train_test_split
 import numpy as np
+import scipy.sparse as sp
+import json
+import os
+import shutil
+import tempfile
+import pickle
 from datetime import datetime
 import matplotlib.pyplot as plt
 import sys
 import seaborn as sns
 from numpy import radians, sin, arcsin, cos, sqrt
 
+# Categorial features that are one-hot encoded
+ONEHOT_COLUMNS = ["ADEP", "ACOperator", "month", "weekday"]
+
+# Folder of the memory mapped arrays that are shared with the workers of parameter searches and training sweeps
+SHARED_FOLDER = "sharedData"
+
+
+def read_lrdata(filename: str = "LRData/LRDATA.parquet", prefer_parquet: bool = False):
+    """Reads the flights in linear regression format with readLRDATA, which detects whether the file is parquet or csv
+
+    Args:
+        filename (str, optional): Filename of the LRData file. Defaults to "LRData/LRDATA.parquet".
+        prefer_parquet (bool, optional): read the .parquet file with the same name instead when it is newer, see readLRDATA. Defaults to False.
+
+    Returns:
+        pd.DataFrame: flights dataframe in linear regression format
+    """
+    return readLRDATA(
+        os.path.dirname(filename) or ".", os.path.basename(filename), prefer_parquet
+    )
+
 
 def filtering_data_onehot(
-    filename: str = "LRData/LRDATA.csv",
+    filename: str = "LRData/LRDATA.parquet",
     start: datetime = datetime(2018, 1, 1),
     end: datetime = datetime(2019, 12, 31),
     airport: str = "EGLL",
     save_to_csv: bool = False,
+    sparse: bool = False,
+    vocabulary_file: str = None,
 ):
     """Takes all the data points in a filename for a given interval of time, encodes it using it get_dummies, and focuses prediction efforts on a single airport of choosing.
 
     Args:
-        filename (str, optional): Filename of the .csv file to extract data from. Defaults to "LRData/LRDATA.csv".
+        filename (str, optional): Filename of the LRData file to extract data from, see read_lrdata. Defaults to "LRData/LRDATA.parquet".
         start (datetime, optional): Starting point of the time interval. Defaults to datetime(2018, 1, 1).
         end (datetime, optional): Ending point of the time interval. Defaults to datetime(2019, 12, 31).
         airport (str, optional): Airport codename. Defaults to "EGLL" (Heathrow Airport).
         airport_capacity (int, optional): Capacity of airport per hour defined as maximum movements per hour possible. Defaults to 88.
+        sparse (bool, optional): Encode with sparse_encode into a scipy CSR matrix instead of a dense array. Defaults to False.
+        vocabulary_file (str, optional): Category vocabulary of the sparse encoding, see sparse_encode. Defaults to None.
 
 
     Returns:
         tuple: Array with all relevant features of the dataset and another array of target variables.
     """
-    df = pd.read_csv(filename, header=0, index_col=0)
+    df = read_lrdata(filename)
 
     dform = "%Y-%m-%d %H:%M:%S"
     df = (
@@ -47,9 +79,19 @@ def filtering_data_onehot(
     )
     df_capacity = capacity_calc(df, airport, airport_dict[airport]["capacity"])
     df_time_distance = time_distance(df_capacity)
+    y = df_capacity["ArrivalDelay"].to_numpy()
+
+    if sparse:
+        X_final = sparse_encode(df_time_distance, airport, vocabulary_file)
+        if save_to_csv:
+            sp.save_npz("data/xdata.npz", X_final)
+            print("-------Regression model sparse matrix to .npz: DONE-------")
+            pd.DataFrame((y)).to_csv("data/ydata.csv", header=False, index=False)
+            print("-------Regression model target variables to .csv: DONE-------")
+        return X_final, y
+
     df_3 = dummies_encode(df_time_distance, airport)
     X_final = scaler(df_3)
-    y = df_capacity["ArrivalDelay"].to_numpy()
 
     if save_to_csv:
         pd.DataFrame((df_3)).to_csv("data/finaldf.csv", header=True, index=False)
@@ -98,35 +140,20 @@ def capacity_calc(P: pd.DataFrame, airport: str = "EGLL", airport_capacity: int
     dform = "%Y-%m-%d %H:%M:%S"
     P = P.assign(FiledOBT=lambda x: pd.to_datetime(x.FiledOBT, format=dform))
 
-    dep = P.query("ADEP == @airport")
-    des = P.query("ADES == @airport")
-    dep = dep.assign(Date=lambda x: x.FiledOBT.dt.date)
-    des = des.assign(Date=lambda x: x.FiledAT.dt.date)
-
-    dep = (
-        dep.assign(Hour=lambda x: x.FiledOBT.dt.hour)
-        .assign(Minutes=lambda x: x.FiledOBT.dt.minute // 15 * 15)
-        .assign(Time=lambda x: x.FiledOBT)
-    )
-    des = (
-        des.assign(Hour=lambda x: x.FiledAT.dt.hour)
-        .assign(Minutes=lambda x: x.FiledAT.dt.minute // 15 * 15)
-        .assign(Time=lambda x: x.FiledAT)
-    )
+    # departures are counted at their off block time and arrivals at their arrival time
+    dep = P.query("ADEP == @airport").assign(Time=lambda x: x.FiledOBT)
+    des = P.query("ADES == @airport").assign(Time=lambda x: x.FiledAT)
 
     new_df = pd.concat([dep, des], axis=0)
-    new_df.Time = new_df.Time.apply(
-        lambda x: pd.datetime(x.year, x.month, x.day, x.hour, x.minute // 15 * 15, 0)
+    # amount of flights in the 15 minute timeslot of each flight
+    new_df["capacity"] = (
+        new_df.groupby(new_df.Time.dt.floor("15min"))["ADES"].transform("count")
+        / airport_capacity
+        / 4
+    )
+    new_df = new_df.drop(["Time"], axis=1).query(
+        "ADES == @airport & ADEP in @airportlist"
     )
-    times = pd.DatetimeIndex(new_df.Time)
-    K = new_df.groupby([times.date, times.hour, times.minute])["ADES"].count()
-    cap_dict = K.to_dict()
-
-    new_df["Time_tuple"] = list(zip(new_df.Date, new_df.Hour, new_df.Minutes))
-    new_df["capacity"] = new_df["Time_tuple"].map(cap_dict) / airport_capacity / 4
-    new_df = new_df.drop(
-        ["Time_tuple", "Date", "Hour", "Minutes", "Time"], axis=1
-    ).query("ADES == @airport & ADEP in @airportlist")
     new_df = new_df.sort_values("FiledAT")
 
     return new_df
@@ -142,9 +169,7 @@ def time_distance(P: pd.DataFrame):
         pd.DataFrame: Same dataframe but with a new column 'flight_time'.
     """
     P = P.assign(distance=lambda row: haversine(row))
-    P["flight_time"] = P.apply(
-        lambda row: (row["FiledAT"] - row["FiledOBT"]).seconds / 60, axis=1
-    )
+    P["flight_time"] = (P["FiledAT"] - P["FiledOBT"]).dt.seconds / 60
     P = P.drop(["ADEPLong", "ADEPLat", "ADESLong", "ADESLat"], axis=1)
 
     return P
@@ -195,6 +220,14 @@ def dummies_encode(P: pd.DataFrame, airport: str = None):
     Returns:
         pd.DataFrame: Pandas DataFrame with all categorial features encoded
     """
+    # categorical columns (binary LRDATA) would get a column for every category
+    P = P.assign(
+        **{
+            column: P[column].cat.remove_unused_categories()
+            for column in P.select_dtypes("category").columns
+        }
+    )
+
     if airport == None:
         new_df = P.drop(["FiledOBT", "FiledAT", "ACType", "ArrivalDelay"], axis=1)
         new_df3 = pd.get_dummies(
@@ -229,6 +262,205 @@ def scaler(P: pd.DataFrame):
     return X_scaled_array
 
 
+def encoded_columns(airport: str = None):
+    """Columns that are dropped and columns that are one-hot encoded by dummies_encode
+
+    Args:
+        airport (str, optional): airport for which calculations will be done. Defaults to None.
+
+    Returns:
+        tuple: list of dropped columns and list of one-hot encoded columns
+    """
+    if airport == None:
+        drop_columns = ["FiledOBT", "FiledAT", "ACType", "ArrivalDelay"]
+        onehot_columns = ["ADEP", "ADES"] + ONEHOT_COLUMNS[1:]
+    else:
+        drop_columns = ["ADES", "FiledOBT", "FiledAT", "ACType", "ArrivalDelay"]
+        onehot_columns = ONEHOT_COLUMNS
+
+    return drop_columns, onehot_columns
+
+
+def onehot_sparse(P: pd.DataFrame, vocabulary: dict):
+    """One-hot encodes columns into a sparse matrix with fixed categories, values outside of them are left out
+
+    Args:
+        P (pd.DataFrame): Pandas DataFrame with the columns in vocabulary
+        vocabulary (dict): sorted list of categories of each column
+
+    Returns:
+        sp.csr_matrix: one-hot encoded columns, in the order of vocabulary
+    """
+    encoder = OneHotEncoder(
+        categories=list(vocabulary.values()), handle_unknown="ignore"
+    )
+    return encoder.fit_transform(P[list(vocabulary)]).tocsr()
+
+
+def sparse_encode(P: pd.DataFrame, airport: str = None, vocabulary_file: str = None):
+    """Encodes the categorial features into a sparse one-hot matrix and scales the other features.
+    Gives the same columns as dummies_encode followed by scaler, without making the dense one-hot frame.
+
+    Args:
+        P (pd.DataFrame): Pandas DataFrame with all flight data
+        airport (str, optional): airport for which calculations will be done. Defaults to None.
+        vocabulary_file (str, optional): json file with the categories of each encoded column. If it exists, its categories
+        are used so the columns line up with earlier data (unknown categories are left out), otherwise the categories
+        found in P are saved to it. Defaults to None.
+
+    Returns:
+        sp.csr_matrix: Scaled features followed by the one-hot encoded features
+    """
+    drop_columns, onehot_columns = encoded_columns(airport)
+
+    if vocabulary_file is not None and os.path.exists(vocabulary_file):
+        with open(vocabulary_file) as f:
+            vocabulary = json.load(f)
+    else:
+        vocabulary = {
+            column: sorted(P[column].dropna().unique().tolist())
+            for column in onehot_columns
+        }
+        if vocabulary_file is not None:
+            with open(vocabulary_file, "w") as f:
+                json.dump(vocabulary, f)
+
+    X_numeric = MinMaxScaler().fit_transform(
+        P.drop(drop_columns + onehot_columns, axis=1).to_numpy()
+    )
+
+    return sp.hstack(
+        [sp.csr_matrix(X_numeric), onehot_sparse(P, vocabulary)], format="csr"
+    )
+
+
+class FlightPreprocessor:
+    def __init__(self, airport: str = "EGLL", sparse: bool = False):
+        """Preprocessing of filtering_data_onehot (capacity_calc, time_distance, dummies_encode and scaler) that is fitted once
+        and can then be saved and applied to new flights in batches, giving the same columns as the fitted data.
+
+        Args:
+            airport (str, optional): Airport codename. Defaults to "EGLL" (Heathrow Airport).
+            sparse (bool, optional): Encode into a scipy CSR matrix, like sparse_encode. Defaults to False.
+        """
+        self.airport = airport
+        self.sparse = sparse
+
+    def features(self, P: pd.DataFrame):
+        """Takes the flights of the airport and adds the capacity, distance and flight time
+
+        Args:
+            P (pd.DataFrame): flights in LRData format, FiledOBT and FiledAT can still be strings
+
+        Returns:
+            tuple: DataFrame with the flights of the airport and array of their arrival delays
+        """
+        airport = self.airport
+        dform = "%Y-%m-%d %H:%M:%S"
+        df = (
+            P.query("ADEP == @airport|ADES== @airport")
+            .assign(FiledOBT=lambda x: pd.to_datetime(x.FiledOBT, format=dform))
+            .assign(FiledAT=lambda x: pd.to_datetime(x.FiledAT, format=dform))
+        )
+        df_capacity = capacity_calc(df, airport, airport_dict[airport]["capacity"])
+
+        return time_distance(df_capacity), df_capacity["ArrivalDelay"].to_numpy()
+
+    def fit(self, P: pd.DataFrame):
+        """Learns the encoded categories and the scaling of the features
+
+        Args:
+            P (pd.DataFrame): flights in LRData format
+
+        Returns:
+            FlightPreprocessor: the fitted preprocessor
+        """
+        return self._fit(self.features(P)[0])
+
+    def _fit(self, df: pd.DataFrame):
+        drop_columns, onehot_columns = encoded_columns(self.airport)
+
+        if self.sparse:
+            self.vocabulary = {
+                column: sorted(df[column].dropna().unique().tolist())
+                for column in onehot_columns
+            }
+            self.scaler = MinMaxScaler().fit(
+                df.drop(drop_columns + onehot_columns, axis=1).to_numpy()
+            )
+        else:
+            df_3 = dummies_encode(df, self.airport)
+            self.columns = list(df_3.columns)
+            self.scaler = MinMaxScaler().fit(df_3.to_numpy())
+
+        return self
+
+    def transform(self, P: pd.DataFrame):
+        """Encodes and scales flights into the fitted columns, categories that were not fitted are left out.
+        The capacity is calculated from the flights in P, so a batch should hold all flights of the airport in its period.
+
+        Args:
+            P (pd.DataFrame): flights in LRData format
+
+        Returns:
+            tuple: Array (or sparse matrix) with the features of the flights of the airport and array of their arrival delays
+        """
+        return self._encode(*self.features(P))
+
+    def _encode(self, df: pd.DataFrame, y: np.ndarray):
+        drop_columns, onehot_columns = encoded_columns(self.airport)
+
+        if self.sparse:
+            X_numeric = self.scaler.transform(
+                df.drop(drop_columns + onehot_columns, axis=1).to_numpy()
+            )
+            X = sp.hstack(
+                [sp.csr_matrix(X_numeric), onehot_sparse(df, self.vocabulary)],
+                format="csr",
+            )
+        else:
+            df_3 = dummies_encode(df, self.airport).reindex(
+                columns=self.columns, fill_value=0
+            )
+            X = self.scaler.transform(df_3.to_numpy())
+
+        return X, y
+
+    def fit_transform(self, P: pd.DataFrame):
+        """Fits the preprocessor and transforms the same flights, gives the same result as filtering_data_onehot
+
+        Args:
+            P (pd.DataFrame): flights in LRData format
+
+        Returns:
+            tuple: Array (or sparse matrix) with the features of the flights of the airport and array of their arrival delays
+        """
+        df, y = self.features(P)
+        return self._fit(df)._encode(df, y)
+
+    def save(self, filename: str):
+        """Saves the fitted preprocessor
+
+        Args:
+            filename (str): file to save to
+        """
+        with open(filename, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(filename: str):
+        """Loads a preprocessor saved by save()
+
+        Args:
+            filename (str): file to load from
+
+        Returns:
+            FlightPreprocessor: the fitted preprocessor
+        """
+        with open(filename, "rb") as f:
+            return pickle.load(f)
+
+
 def get_preprocessed_data(
     folderName: str = "data",
     fileName_x: str = "xdata.csv",
@@ -238,13 +470,17 @@ def get_preprocessed_data(
 
     Args:
         folderName (str, optional): Name of the folder which the data is in. Defaults to "data".
-        fileName_x (str, optional): Name of the file containing the data of the features(X). Defaults to "xdata.csv".
+        fileName_x (str, optional): Name of the file containing the data of the features(X), a .npz file is read as a sparse matrix. Defaults to "xdata.csv".
         fileName_y (str, optional): name of the file containing the labels(y). Defaults to "ydata.csv".
 
     Returns:
         [type]: [description]
     """
-    X = np.genfromtxt(f"{folderName}/{fileName_x}", delimiter=",")
+    if fileName_x.endswith(".npz"):
+        # sparse features saved by filtering_data_onehot(sparse=True)
+        X = sp.load_npz(f"{folderName}/{fileName_x}")
+    else:
+        X = np.genfromtxt(f"{folderName}/{fileName_x}", delimiter=",")
     print(f"Data points saved under filename {fileName_x} ---- EXTRACTED.")
     y = np.genfromtxt(f"{folderName}/{fileName_y}", delimiter=",")
     print(f"Target variables saved under filename {fileName_y} ---- EXTRACTED.")
@@ -252,6 +488,131 @@ def get_preprocessed_data(
     return X, y
 
 
+def _share_frame(P: pd.DataFrame, folder: str):
+    columns = []
+    for i, column in enumerate(P.columns):
+        values = P[column]
+        if pd.api.types.is_string_dtype(values.dtype):
+            values = values.astype("category")
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            np.save(f"{folder}/{i}.npy", values.cat.codes.to_numpy())
+            columns.append(
+                {
+                    "name": column,
+                    "categories": values.cat.categories.tolist(),
+                    "ordered": bool(values.cat.ordered),
+                }
+            )
+        elif isinstance(values.dtype, np.dtype) and values.dtype.kind in "biufmM":
+            np.save(f"{folder}/{i}.npy", values.to_numpy())
+            columns.append({"name": column})
+        else:
+            raise ValueError(
+                f"Column {column} of type {values.dtype} can not be shared"
+            )
+
+    if isinstance(P.index, pd.RangeIndex):
+        index = {"start": P.index.start, "stop": P.index.stop, "step": P.index.step}
+    else:
+        np.save(f"{folder}/index.npy", P.index.to_numpy())
+        index = None
+
+    return {"type": "frame", "columns": columns, "index": index}
+
+
+def _attach_frame(folder: str, meta: dict):
+    data = {}
+    for i, column in enumerate(meta["columns"]):
+        values = np.load(f"{folder}/{i}.npy", mmap_mode="r")
+        if "categories" in column:
+            values = pd.Categorical.from_codes(
+                values, column["categories"], column["ordered"]
+            )
+        data[column["name"]] = values
+
+    if meta["index"] is None:
+        index = pd.Index(np.load(f"{folder}/index.npy", mmap_mode="r"), copy=False)
+    else:
+        index = pd.RangeIndex(**meta["index"])
+
+    # Without copying, pandas keeps every column in its own block on the memory map
+    return pd.DataFrame(data, index=index, copy=False)
+
+
+def share_data(folder: str = SHARED_FOLDER, **data):
+    """Writes arrays, sparse matrices or DataFrames once to memory mapped files, which are then opened read-only.
+    Joblib and process pool workers that get the opened data only receive the location of the files
+    and attach to the same memory instead of each getting a copy. Every call writes to a new folder inside folder,
+    which the caller removes with shutil.rmtree once the workers are done.
+
+    Args:
+        folder (str, optional): folder in which the folder of the shared data is made. Defaults to SHARED_FOLDER.
+        **data: arrays, scipy sparse matrices or DataFrames to share by name. Text columns of DataFrames
+        are stored as categories.
+
+    Returns:
+        tuple: location of the shared data and a dict with the shared data by name, opened with attach_data
+    """
+    os.makedirs(folder, exist_ok=True)
+    location = tempfile.mkdtemp(dir=folder)
+
+    try:
+        meta = {}
+        for name, values in data.items():
+            if isinstance(values, pd.DataFrame):
+                os.makedirs(f"{location}/{name}")
+                meta[name] = _share_frame(values, f"{location}/{name}")
+            elif sp.issparse(values):
+                values = values.tocsr()
+                os.makedirs(f"{location}/{name}")
+                for part in ["data", "indices", "indptr"]:
+                    np.save(f"{location}/{name}/{part}.npy", getattr(values, part))
+                meta[name] = {"type": "csr", "shape": list(values.shape)}
+            else:
+                np.save(f"{location}/{name}.npy", np.ascontiguousarray(values))
+                meta[name] = {"type": "array"}
+
+        # Written last, so the folder is only attached to once it is complete
+        with open(f"{location}/shared.json", "w") as f:
+            json.dump(meta, f, default=str)
+    except BaseException:
+        shutil.rmtree(location, ignore_errors=True)
+        raise
+
+    return location, attach_data(location)
+
+
+def attach_data(folder: str):
+    """Opens the data written by share_data read-only without copying it into memory
+
+    Args:
+        folder (str): location of the shared data returned by share_data
+
+    Returns:
+        dict: the shared arrays, sparse matrices and DataFrames by name
+    """
+    with open(f"{folder}/shared.json") as f:
+        meta = json.load(f)
+
+    data = {}
+    for name, entry in meta.items():
+        if entry["type"] == "frame":
+            data[name] = _attach_frame(f"{folder}/{name}", entry)
+        elif entry["type"] == "csr":
+            data[name] = sp.csr_matrix(
+                tuple(
+                    np.load(f"{folder}/{name}/{part}.npy", mmap_mode="r")
+                    for part in ["data", "indices", "indptr"]
+                ),
+                shape=tuple(entry["shape"]),
+                copy=False,
+            )
+        else:
+            data[name] = np.load(f"{folder}/{name}.npy", mmap_mode="r")
+
+    return data
+
+
 def parameter_search(
     model,
     parameters: dict,
@@ -259,6 +620,7 @@ def parameter_search(
     y_train: np.array,
     score_string: str,
     n_folds: int = 5,
+    shared_folder: str = SHARED_FOLDER,
 ):
     """Optimizes parameters of model using cross-validation.
 
@@ -269,20 +631,26 @@ def parameter_search(
         y_train (np.array): training labels
         score_string (str, optional): defines the to use score function. Get strings from https://scikit-learn.org/stable/modules/model_evaluation.html#scoring-parameter. Defaults to "neg_mean_squared_error".
         n_folds (int, optional): number of folds to use for cros-validation. Defaults to 5.
+        shared_folder (str, optional): folder in which the training data is shared with the workers of the search, see share_data. Defaults to SHARED_FOLDER.
 
     Returns:
         dict: optimal parameters for model
     """
 
-    cv = KFold(n_splits=n_folds, random_state=42, shuffle=True)
-    grid_search = GridSearchCV(
-        model,
-        parameters,
-        cv=cv,
-        n_jobs=-1,
-        verbose=4,
-        scoring=score_string,
-    ).fit(X_train, y_train)
+    # The workers of the search attach to one memory mapped copy of the training data
+    location, shared = share_data(shared_folder, X=X_train, y=y_train)
+    try:
+        cv = KFold(n_splits=n_folds, random_state=42, shuffle=True)
+        grid_search = GridSearchCV(
+            model,
+            parameters,
+            cv=cv,
+            n_jobs=-1,
+            verbose=4,
+            scoring=score_string,
+        ).fit(shared["X"], shared["y"])
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
 
     print("grid search = ", grid_search)
     print("best params = ", grid_search.best_params_)
@@ -299,7 +667,6 @@ def parameter_search(
         plt.ylabel("MSE")
         plt.show()
 
-    filedOBT = pd.read_csv("./data/finaldf.csv", header=0).to_numpy()[:, 1]
     best_parameters = grid_search.best_params_
 
     if type(model) == KNeighborsRegressor:
@@ -351,14 +718,14 @@ def plot(
 
 
 def flights_per_airport(
-    filename: str = "LRData/LRDATA.csv",
+    filename: str = "LRData/LRDATA.parquet",
     start: datetime = datetime(2018, 1, 1),
     end: datetime = datetime(2019, 12, 31),
 ):
     """Takes all the data points in a filename for a given interval of time, and makes a dict for each airport with amount of flights from that airport.
 
     Args:
-        filename (str, optional): Filename of the .csv file to extract data from. Defaults to "LRData/LRDATA.csv".
+        filename (str, optional): Filename of the LRData file to extract data from, see read_lrdata. Defaults to "LRData/LRDATA.parquet".
         start (datetime, optional): Starting point of the time interval. Defaults to datetime(2018, 1, 1).
         end (datetime, optional): Ending point of the time interval. Defaults to datetime(2019, 12, 31).
 
@@ -366,7 +733,7 @@ def flights_per_airport(
         dict: Dictionary with all airports as keys and their amount of flights as values.
         list: list of all airports
     """
-    df = pd.read_csv(filename, header=0, index_col=0)
+    df = read_lrdata(filename)
 
     dform = "%Y-%m-%d %H:%M:%S"
     df = df.assign(FiledOBT=lambda x: pd.to_datetime(x.FiledOBT, format=dform)).assign(
@@ -375,7 +742,7 @@ def flights_per_airport(
     df_2 = data_filter_outliers(df)
     result = {}
     airport_list = []
-    lr_df = pd.read_csv("./LRData/LRDATA.csv", header=0, index_col=0)
+    lr_df = read_lrdata(filename)
 
     print("Making Airport list ---------------------")
     for airport in lr_df["ADES"]:
@@ -0,0 +1,147 @@
+"""Benchmark of capacity_calc and time_distance against the row-wise versions they replaced.
+
+Run from the root of the repository with `python tests/benchmark_tool_box.py`. Both versions are run on
+the same synthetic flights of one airport, with FiledOBT as text as in LRDATA.csv, and their outputs are
+checked to be equal before the rows per second are printed.
+"""
+
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(".")
+import extraction  # imported first, because extraction imports regressionModels.tool_box itself
+from extraction.airportvalues import airport_dict
+from extraction.extractionvalues import ICAOTOP50
+from regressionModels.tool_box import capacity_calc, haversine, time_distance
+
+
+def synthetic_flights(airport: str = "EGLL", n: int = 200000, seed: int = 0):
+    """Flights from or to one airport in the LRData format used by capacity_calc and time_distance
+
+    Args:
+        airport (str, optional): Airport codename. Defaults to "EGLL".
+        n (int, optional): amount of flights. Defaults to 200000.
+        seed (int, optional): seed of the random flights. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: flights with FiledOBT as text
+    """
+    rng = np.random.default_rng(seed)
+    others = np.array([other for other in ICAOTOP50 if other != airport])
+    other = others[rng.integers(len(others), size=n)]
+    departs = rng.random(n) < 0.5
+
+    filedOBT = pd.Timestamp(2018, 1, 1) + pd.to_timedelta(
+        rng.integers(0, 2 * 365 * 24 * 60, size=n), unit="min"
+    )
+    filedAT = filedOBT + pd.to_timedelta(rng.integers(40, 300, size=n), unit="min")
+
+    P = pd.DataFrame(
+        {
+            "ADEP": np.where(departs, airport, other),
+            "ADES": np.where(departs, other, airport),
+            "FiledOBT": filedOBT.strftime("%Y-%m-%d %H:%M:%S"),
+            "FiledAT": filedAT,
+            "ArrivalDelay": rng.integers(-30, 90, size=n),
+        }
+    )
+    for end in ["ADEP", "ADES"]:
+        P[f"{end}Lat"] = P[end].map(lambda x: airport_dict[x]["latitude"])
+        P[f"{end}Long"] = P[end].map(lambda x: airport_dict[x]["longitude"])
+
+    return P
+
+
+def capacity_calc_rowwise(
+    P: pd.DataFrame, airport: str = "EGLL", airport_capacity: int = 88
+):
+    """capacity_calc before it was vectorised, with datetime in place of the removed pd.datetime"""
+    airportlist = ICAOTOP50
+    dform = "%Y-%m-%d %H:%M:%S"
+    P = P.assign(FiledOBT=lambda x: pd.to_datetime(x.FiledOBT, format=dform))
+
+    dep = P.query("ADEP == @airport")
+    des = P.query("ADES == @airport")
+    dep = dep.assign(Date=lambda x: x.FiledOBT.dt.date)
+    des = des.assign(Date=lambda x: x.FiledAT.dt.date)
+
+    dep = (
+        dep.assign(Hour=lambda x: x.FiledOBT.dt.hour)
+        .assign(Minutes=lambda x: x.FiledOBT.dt.minute // 15 * 15)
+        .assign(Time=lambda x: x.FiledOBT)
+    )
+    des = (
+        des.assign(Hour=lambda x: x.FiledAT.dt.hour)
+        .assign(Minutes=lambda x: x.FiledAT.dt.minute // 15 * 15)
+        .assign(Time=lambda x: x.FiledAT)
+    )
+
+    new_df = pd.concat([dep, des], axis=0)
+    new_df.Time = new_df.Time.apply(
+        lambda x: datetime(x.year, x.month, x.day, x.hour, x.minute // 15 * 15, 0)
+    )
+    times = pd.DatetimeIndex(new_df.Time)
+    K = new_df.groupby([times.date, times.hour, times.minute])["ADES"].count()
+    cap_dict = K.to_dict()
+
+    new_df["Time_tuple"] = list(zip(new_df.Date, new_df.Hour, new_df.Minutes))
+    new_df["capacity"] = new_df["Time_tuple"].map(cap_dict) / airport_capacity / 4
+    new_df = new_df.drop(
+        ["Time_tuple", "Date", "Hour", "Minutes", "Time"], axis=1
+    ).query("ADES == @airport & ADEP in @airportlist")
+    new_df = new_df.sort_values("FiledAT")
+
+    return new_df
+
+
+def time_distance_rowwise(P: pd.DataFrame):
+    """time_distance before it was vectorised"""
+    P = P.assign(distance=lambda row: haversine(row))
+    P["flight_time"] = P.apply(
+        lambda row: (row["FiledAT"] - row["FiledOBT"]).seconds / 60, axis=1
+    )
+    P = P.drop(["ADEPLong", "ADEPLat", "ADESLong", "ADESLat"], axis=1)
+
+    return P
+
+
+def rows_per_second(function, P: pd.DataFrame, repeat: int = 3):
+    """Runs function on P repeat times and returns its output and the rows per second of the fastest run"""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(P)
+        best = min(best, time.perf_counter() - start)
+
+    return result, len(P) / best
+
+
+if __name__ == "__main__":
+    airport = "EGLL"
+    P = synthetic_flights(airport)
+    capacity = airport_dict[airport]["capacity"]
+    print(f"{len(P)} {airport} flights, pandas {pd.__version__}")
+
+    benchmarks = [
+        (
+            "capacity_calc (incl. FiledOBT parsing)",
+            lambda x: capacity_calc_rowwise(x, airport, capacity),
+            lambda x: capacity_calc(x, airport, capacity),
+            P,
+        ),
+        (
+            "time_distance",
+            time_distance_rowwise,
+            time_distance,
+            capacity_calc(P, airport, capacity),
+        ),
+    ]
+    for name, rowwise, vectorised, data in benchmarks:
+        expected, before = rows_per_second(rowwise, data)
+        result, after = rows_per_second(vectorised, data)
+        assert result.equals(expected), f"{name} differs from the row-wise version"
+        print(f"{name}: {before:,.0f} -> {after:,.0f} rows/s")
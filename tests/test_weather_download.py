@@ -0,0 +1,231 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.append(".")
+from extraction import weather
+
+
+class GribHandler(BaseHTTPRequestHandler):
+    """Stand-in for the NCEI server with support for Range requests"""
+
+    # path -> content of the file
+    files = {}
+    # path -> amount of bytes sent before the connection is closed
+    truncate = {}
+    # path -> start of the range answered to a Range request, instead of the requested start
+    bad_range = {}
+    # paths that answer 416 without the size of the file
+    no_range_length = set()
+    # paths whose connection is closed without a response
+    reset = set()
+    # paths sent without Content-Length, so a closed connection looks like the end of the file
+    no_length = set()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path in self.reset:
+            self.close_connection = True
+            return
+        if self.path not in self.files:
+            self.send_error(404)
+            return
+
+        content = self.files[self.path]
+        start = 0
+        if "Range" in self.headers:
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            if start >= len(content):
+                self.send_response(416)
+                if self.path not in self.no_range_length:
+                    self.send_header("Content-Range", "bytes */%d" % len(content))
+                self.end_headers()
+                return
+            start = self.bad_range.get(self.path, start)
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                "bytes %d-%d/%d" % (start, len(content) - 1, len(content)),
+            )
+        else:
+            self.send_response(200)
+        body = content[start:]
+        if self.path not in self.no_length:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        # the truncation only happens once, like a dropped connection
+        sent = self.truncate.pop(self.path, len(body))
+        self.wfile.write(body[:sent])
+        self.close_connection = True
+
+
+class DownloadTest(unittest.TestCase):
+    def setUp(self):
+        GribHandler.files = {
+            "/a.grb2": os.urandom(300000),
+            "/b.grb2": os.urandom(200000),
+        }
+        GribHandler.truncate = {}
+        GribHandler.bad_range = {}
+        GribHandler.no_range_length = set()
+        GribHandler.reset = set()
+        GribHandler.no_length = set()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), GribHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.folder.cleanup()
+
+    def download(self, name):
+        fpath = os.path.join(self.folder.name, name)
+        try:
+            downloaded = weather.download_grb(f"{self.url}/{name}", fpath)
+        except weather.requests.RequestException:
+            downloaded = False
+        return downloaded, fpath
+
+    def test_download(self):
+        downloaded, fpath = self.download("a.grb2")
+
+        self.assertTrue(downloaded)
+        with open(fpath, "rb") as f:
+            self.assertEqual(f.read(), GribHandler.files["/a.grb2"])
+        self.assertFalse(os.path.exists(fpath + ".part"))
+
+    def test_missing_file(self):
+        downloaded, fpath = self.download("c.grb2")
+
+        self.assertFalse(downloaded)
+        self.assertFalse(os.path.exists(fpath))
+
+    def test_truncated_download_is_resumed(self):
+        GribHandler.truncate["/a.grb2"] = 100000
+
+        downloaded, fpath = self.download("a.grb2")
+        self.assertFalse(downloaded)
+        self.assertFalse(os.path.exists(fpath))
+
+        downloaded, fpath = self.download("a.grb2")
+        self.assertTrue(downloaded)
+        with open(fpath, "rb") as f:
+            self.assertEqual(f.read(), GribHandler.files["/a.grb2"])
+
+    def test_truncated_range_is_resumed(self):
+        fpath = os.path.join(self.folder.name, "a.grb2")
+        with open(fpath + ".part", "wb") as f:
+            f.write(GribHandler.files["/a.grb2"][:50000])
+        GribHandler.truncate["/a.grb2"] = 1000
+        GribHandler.no_length.add("/a.grb2")
+
+        self.assertFalse(self.download("a.grb2")[0])
+        self.assertEqual(os.path.getsize(fpath + ".part"), 51000)
+
+        self.assertTrue(self.download("a.grb2")[0])
+        with open(fpath, "rb") as f:
+            self.assertEqual(f.read(), GribHandler.files["/a.grb2"])
+
+    def test_closed_stream_without_length_is_resumed(self):
+        GribHandler.truncate["/a.grb2"] = 100000
+        GribHandler.no_length.add("/a.grb2")
+
+        # without a range the size of the file is not known, the part is kept when it is resumed
+        fpath = os.path.join(self.folder.name, "a.grb2")
+        with open(fpath + ".part", "wb") as f:
+            f.write(GribHandler.files["/a.grb2"][:10])
+        self.assertFalse(self.download("a.grb2")[0])
+        self.assertEqual(os.path.getsize(fpath + ".part"), 100010)
+
+        self.assertTrue(self.download("a.grb2")[0])
+        with open(fpath, "rb") as f:
+            self.assertEqual(f.read(), GribHandler.files["/a.grb2"])
+
+    def test_range_from_start_of_file(self):
+        fpath = os.path.join(self.folder.name, "a.grb2")
+        with open(fpath + ".part", "wb") as f:
+            f.write(GribHandler.files["/a.grb2"][:50000])
+        GribHandler.bad_range["/a.grb2"] = 0
+
+        self.assertTrue(self.download("a.grb2")[0])
+        with open(fpath, "rb") as f:
+            self.assertEqual(f.read(), GribHandler.files["/a.grb2"])
+
+    def test_range_not_at_end_of_part(self):
+        fpath = os.path.join(self.folder.name, "a.grb2")
+        with open(fpath + ".part", "wb") as f:
+            f.write(GribHandler.files["/a.grb2"][:50000])
+        GribHandler.bad_range["/a.grb2"] = 40000
+
+        # the part can not be continued, so it is started again
+        self.assertFalse(self.download("a.grb2")[0])
+        self.assertFalse(os.path.exists(fpath))
+        self.assertFalse(os.path.exists(fpath + ".part"))
+
+        self.assertTrue(self.download("a.grb2")[0])
+        with open(fpath, "rb") as f:
+            self.assertEqual(f.read(), GribHandler.files["/a.grb2"])
+
+    def test_complete_part_file(self):
+        fpath = os.path.join(self.folder.name, "a.grb2")
+        with open(fpath + ".part", "wb") as f:
+            f.write(GribHandler.files["/a.grb2"])
+
+        self.assertTrue(self.download("a.grb2")[0])
+        with open(fpath, "rb") as f:
+            self.assertEqual(f.read(), GribHandler.files["/a.grb2"])
+
+    def test_unknown_size_after_part_file(self):
+        fpath = os.path.join(self.folder.name, "a.grb2")
+        with open(fpath + ".part", "wb") as f:
+            f.write(GribHandler.files["/a.grb2"] + b"corrupt")
+        GribHandler.no_range_length.add("/a.grb2")
+
+        # without the size of the file the part can not be checked, so it is started again
+        self.assertFalse(self.download("a.grb2")[0])
+        self.assertFalse(os.path.exists(fpath))
+        self.assertFalse(os.path.exists(fpath + ".part"))
+
+        self.assertTrue(self.download("a.grb2")[0])
+        with open(fpath, "rb") as f:
+            self.assertEqual(f.read(), GribHandler.files["/a.grb2"])
+
+    def test_bulk_keeps_going_after_failed_download(self):
+        dates = [datetime(2019, 1, 1, 0), datetime(2019, 1, 1, 6)]
+        remote = {
+            dates[0]: "/a.grb2",
+            dates[1]: "/b.grb2",
+        }
+        GribHandler.reset.add("/b.grb2")
+
+        def location(year, month, day, hour, pred=0, url=weather.GFS_URL):
+            path = remote[datetime(year, month, day, hour)]
+            return url + path, os.path.join(self.folder.name, path[1:])
+
+        decoded = []
+        with mock.patch.object(
+            weather, "GRIB_FOLDER", self.folder.name
+        ), mock.patch.object(weather, "grb_location", location), mock.patch.object(
+            weather, "grb_downloaded", return_value=False
+        ), mock.patch.object(
+            weather, "decode_grb", lambda fpath, *date: decoded.append(fpath)
+        ):
+            missing = weather.fetch_grb_bulk(dates, workers=2, url=self.url)
+
+        self.assertEqual(missing, [dates[1]])
+        self.assertEqual(decoded, [os.path.join(self.folder.name, "a.grb2")])
+
+
+if __name__ == "__main__":
+    unittest.main()